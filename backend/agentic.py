@@ -3,26 +3,51 @@ import torch
 
 import os
 import json
+import operator
 import io
 import re
+import threading
+import time
+import atexit
 import cv2
 import numpy as np
 import easyocr
+from functools import lru_cache
 from math import isfinite
-from typing import Dict, Any, Optional, TypedDict
+from typing import Dict, Any, Optional, TypedDict, Annotated
 from pathlib import Path
 from PIL import Image
 from dotenv import load_dotenv
 
+# Optional fast JSON codec for the twin, prompts and LLM replies — stdlib
+# json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(obj, indent: bool = False) -> str:
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+    return json.dumps(obj, indent=2 if indent else None)
+
+
+def _json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
 # Load environment variables (override=True ensures .env wins over stale system vars)
 load_dotenv(override=True)
 
 from ultralytics import YOLO
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
+from langgraph.types import CachePolicy
+from langgraph.cache.memory import InMemoryCache
 
 # --- Gemini imports (commented out — uncomment if OpenRouter breaks) ---
 # from langchain_google_genai import ChatGoogleGenerativeAI
@@ -44,8 +69,27 @@ DIGITAL_TWIN_PATH = str(BASE_DIR / "backend" / "mock_digital_twin.json")
 BASE_PRICE = 50
 ELASTICITY = 1.2
 
+# Batched OCR: all plate crops from one frame are padded (never stretched)
+# to a common size and recognised in one readtext_batched call
+OCR_BATCH_SIZE = 8
+
+# YOLO boxes smaller than this (px²) are too small to read and skip OCR
+OCR_MIN_BOX_AREA = 300
+
+# Optional Otsu binarisation of plate crops before OCR (off by default —
+# EasyOCR handles contrast itself on greyscale input)
+OCR_BINARIZE = os.environ.get("OCR_BINARIZE", "false").lower() == "true"
+
+# YOLO runs FP16 on CUDA (half the memory traffic, Tensor-core math);
+# CPU stays FP32, where half precision is unsupported/slower
+YOLO_IMGSZ = 640
+YOLO_HALF  = torch.cuda.is_available()
+
 # Init models & DB
 yolo = YOLO(YOLO_MODEL_PATH)
+_yolo_lock = threading.Lock()   # ultralytics predictors aren't thread-safe
+if YOLO_HALF:
+    yolo.to("cuda")
 if torch.cuda.is_available():
     reader = easyocr.Reader(["en"], gpu=True)
 else:
@@ -65,6 +109,14 @@ llm = ChatOpenAI(
     max_retries=2,               # retry transient 5xx once
 )
 
+# Cap concurrent LLM requests across all agents and Flask request threads
+# (the slot and pricing branches run in parallel, and so do clients) so a
+# burst of arrivals doesn't trip the provider's rate limits. This only
+# bounds load; slot picks made in parallel are kept from colliding by
+# _occupy_slot's check-and-reject, not by this semaphore.
+MAX_PAR_LLM = int(os.environ.get("MAX_PAR_LLM", "3"))
+_llm_slots  = threading.BoundedSemaphore(MAX_PAR_LLM)
+
 # --- Gemini fallback (commented out) ---
 # llm = ChatGoogleGenerativeAI(
 #     model="gemini-1.5-flash",
@@ -92,7 +144,7 @@ def set_model(model_id: str):
     Args:
         model_id: OpenRouter model string, e.g. 'google/gemma-3-4b-it:free'
     """
-    global llm, reservation_llm, pricing_llm, persist_llm
+    global llm, reservation_llm, pricing_llm, persist_llm, _slot_chain
 
     print(f"[MODEL SWAP] Switching to: {model_id}")
     llm = ChatOpenAI(
@@ -107,6 +159,10 @@ def set_model(model_id: str):
     reservation_llm = llm.bind_tools(reservation_tools)
     pricing_llm     = llm.bind_tools(pricing_tools)
     persist_llm     = llm.bind_tools(persist_tools)
+    _slot_chain     = _build_slot_chain()
+    # Memoised slot picks belong to the previous model
+    _llm_pick_slot.cache_clear()
+    _ENTRY_GRAPH.clear_cache()
     print(f"[MODEL SWAP] Done — all agents now using {model_id}")
 
 
@@ -145,59 +201,120 @@ def _extract_text(content) -> str:
 def preprocess_for_ocr(image: np.ndarray) -> np.ndarray:
     if len(image.shape) == 3:
         image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if OCR_BINARIZE:
+        # OpenCV's native Otsu kernel releases the GIL, so it overlaps with
+        # YOLO/OCR work on other request threads
+        _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
     return image
 
 
+# Deletes every ASCII character that is not a letter or digit (str.translate
+# runs in C, unlike a per-character Python loop)
+_ASCII_NON_ALNUM = str.maketrans(
+    "", "", "".join(chr(c) for c in range(128) if not chr(c).isalnum())
+)
+
+
+def _ascii_alnum(text: str) -> str:
+    return text.encode("ascii", "ignore").decode("ascii").translate(_ASCII_NON_ALNUM)
+
+
+def _ocr_text(results) -> str:
+    return "".join(
+        _ascii_alnum(text) for box, text, confidence in results if confidence > 0.1
+    )
+
+
 def run_easyocr(processed_image) -> str:
-    results = reader.readtext(processed_image)
-    extracted_text = []
-    print(results)
-    for box, text, confidence in results:
-        if confidence > 0.1:
-            for char in text:
-                if char in "abcdefghijklmnopqrstuvwxyz0123456789ABCDEFGHIJKLMNOPQRSTUWVXYZ":
-                    extracted_text.append(char)
-    return "".join(extracted_text)
+    return _ocr_text(reader.readtext(processed_image))
+
+
+def _pad_to(image: np.ndarray, h: int, w: int) -> np.ndarray:
+    """Pad a greyscale crop to (h, w) with its median grey, keeping its aspect ratio."""
+    fill = int(np.median(image))
+    return cv2.copyMakeBorder(image, 0, h - image.shape[0], 0, w - image.shape[1],
+                              cv2.BORDER_CONSTANT, value=fill)
+
+
+def run_easyocr_batch(processed_images: list) -> list:
+    """OCR several crops at once; one text string per crop, in order."""
+    if len(processed_images) == 1:
+        # Single crop: no padding needed
+        return [run_easyocr(processed_images[0])]
+    # readtext_batched needs equal-sized images; pad rather than pass
+    # n_width/n_height, which would stretch square and two-line plates
+    h = max(img.shape[0] for img in processed_images)
+    w = max(img.shape[1] for img in processed_images)
+    batched = reader.readtext_batched(
+        [_pad_to(img, h, w) for img in processed_images], batch_size=OCR_BATCH_SIZE
+    )
+    return [_ocr_text(results) for results in batched]
 
 
 def normalize_plate(text: str) -> str:
-    return "".join(c for c in text.upper() if c.isalnum())
+    return _ascii_alnum(text).upper()
 
 
 # ---------------------------------------------------------------------------
 # Vision agent (NO LLM)
 # ---------------------------------------------------------------------------
 
-def vision_agent_process(image_bytes: bytes) -> Dict[str, Any]:
-    try:
-        image = Image.open(io.BytesIO(image_bytes))
-        frame = np.array(image)
+def _plausible_plate(raw: str, log_detection: bool) -> Optional[Dict[str, Any]]:
+    plate = normalize_plate(raw)
+    if plate and len(plate) >= 4:
+        if log_detection:
+            log_plate_detection(plate)
+        print(f"[VISION] Plate detected: {plate}")
+        return {"plate": plate, "raw_plate": raw}
+    return None
 
-        if frame.ndim == 3:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
 
-        results = yolo(frame)
-        h, w = frame.shape[:2]
+def _plate_from_result(frame: np.ndarray, r, log_detection: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    OCR the most confident YOLO box first and return it if it reads as a
+    plausible plate; only otherwise OCR the remaining boxes, as one batch.
+    """
+    h, w = frame.shape[:2]
+
+    crops = []
+    for box in sorted(r.boxes, key=lambda b: b.conf.item(), reverse=True):
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
 
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                x1, y1 = max(0, x1), max(0, y1)
-                x2, y2 = min(w, x2), min(h, y2)
+        if (x2 - x1) * (y2 - y1) < OCR_MIN_BOX_AREA:
+            continue
+        crops.append(preprocess_for_ocr(frame[y1:y2, x1:x2]))
 
-                crop = frame[y1:y2, x1:x2]
-                if crop.size == 0:
-                    continue
+    if not crops:
+        return None
 
-                processed = preprocess_for_ocr(crop)
-                raw = run_easyocr(processed)
-                plate = normalize_plate(raw)
+    # Early exit: the top box is almost always the plate
+    hit = _plausible_plate(run_easyocr(crops[0]), log_detection)
+    if hit or len(crops) == 1:
+        return hit
 
-                if plate and len(plate) >= 4:
-                    log_plate_detection(plate)
-                    print(f"[VISION] Plate detected: {plate}")
-                    return {"plate": plate, "raw_plate": raw}
+    for raw in run_easyocr_batch(crops[1:]):
+        hit = _plausible_plate(raw, log_detection)
+        if hit:
+            return hit
 
+    return None
+
+
+def _yolo_detect(source):
+    """Run the plate detector on one frame or a list of frames."""
+    with _yolo_lock, torch.inference_mode():
+        return yolo(source, half=YOLO_HALF, imgsz=YOLO_IMGSZ, verbose=False)
+
+
+def vision_agent_process_frame(frame: np.ndarray) -> Dict[str, Any]:
+    """Detect a plate in a single BGR frame (as produced by cv2 / PyAV)."""
+    try:
+        for r in _yolo_detect(frame):
+            hit = _plate_from_result(frame, r)
+            if hit:
+                return hit
         return {"plate": None}
 
     except Exception as e:
@@ -205,18 +322,161 @@ def vision_agent_process(image_bytes: bytes) -> Dict[str, Any]:
         return {"plate": None}
 
 
+def vision_agent_process_batch(frames: list, log_detections: bool = True) -> list:
+    """
+    Detect plates in several BGR frames with one YOLO forward pass.
+    Returns one result dict per input frame, in order. With
+    log_detections=False the caller records detections itself (in bulk).
+    """
+    if not frames:
+        return []
+    try:
+        results = _yolo_detect(frames)
+    except Exception as e:
+        print(f"[VISION] Batch error: {e}")
+        return [{"plate": None} for _ in frames]
+
+    out = []
+    for frame, r in zip(frames, results):
+        try:
+            out.append(_plate_from_result(frame, r, log_detections) or {"plate": None})
+        except Exception as e:
+            print(f"[VISION] Error: {e}")
+            out.append({"plate": None})
+    return out
+
+
+def vision_agent_process_bytes(image_bytes: bytes) -> Dict[str, Any]:
+    """Detect a plate in an encoded image (JPEG/PNG bytes from an upload)."""
+    try:
+        # One decode straight to the BGR layout YOLO/OCR use
+        frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+        if frame is None:
+            # Formats OpenCV can't decode (e.g. GIF) still go through PIL
+            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+            frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+    except Exception as e:
+        print(f"[VISION] Error: {e}")
+        return {"plate": None}
+
+    return vision_agent_process_frame(frame)
+
+
+# Original name, kept for existing callers
+vision_agent_process = vision_agent_process_bytes
+
+
 # ---------------------------------------------------------------------------
 # Digital twin helpers
 # ---------------------------------------------------------------------------
 
+# The twin is re-read only when the file's mtime changes (e.g. an external
+# reset script rewrote it); every other call is served from memory.
+# save_twin() updates memory immediately and leaves the file write to a
+# debounced background writer. While a write is pending the in-memory copy
+# is authoritative and the file is not re-read. "version" bumps on every
+# change so derived views (the slot SoA) know when to rebuild.
+TWIN_WRITE_DELAY = 0.1   # seconds — coalesces bursts of saves into one write
+
+_twin_cache = {"mtime": None, "data": None, "version": 0, "pending": False}
+_twin_lock  = threading.RLock()
+_twin_write_lock = threading.Lock()   # serialises file writes; never taken under _twin_lock
+_twin_dirty = threading.Event()
+_twin_writer = None
+
+
+def _copy_twin(dt: dict) -> dict:
+    # Slots are flat dicts, so copying each one is enough to stop callers that
+    # flip s["status"] from mutating the cached twin behind save_twin's back.
+    return {**dt, "slots": [dict(s) for s in dt["slots"]]}
+
+
+def _cached_twin() -> dict:
+    """Return the cached twin (re-parsed if the file changed). Read-only!"""
+    with _twin_lock:
+        if _twin_cache["pending"]:
+            return _twin_cache["data"]
+        mtime = os.stat(DIGITAL_TWIN_PATH).st_mtime_ns
+        if _twin_cache["mtime"] != mtime:
+            with open(DIGITAL_TWIN_PATH, "rb") as f:
+                raw = f.read()
+            _twin_cache["data"]     = _json_loads(raw)
+            _twin_cache["mtime"]    = mtime
+            _twin_cache["version"] += 1
+        return _twin_cache["data"]
+
+
 def load_twin() -> dict:
-    with open(DIGITAL_TWIN_PATH) as f:
-        return json.load(f)
+    return _copy_twin(_cached_twin())
+
+
+def twin_total_slots() -> int:
+    """Slot count straight from the cache — no copy, no parse unless the file changed."""
+    return len(_cached_twin()["slots"])
+
+
+def _write_twin_file():
+    """Write the cached twin to disk if a save is pending."""
+    # One file write at a time (the background writer vs. flush_twin), so an
+    # older snapshot can never be os.replace'd over a newer one
+    with _twin_write_lock:
+        with _twin_lock:
+            if not _twin_cache["pending"]:
+                return
+            data, version = _twin_cache["data"], _twin_cache["version"]
+
+        # Serialise and write outside _twin_lock; cached data is replaced,
+        # never mutated, so the snapshot stays consistent
+        tmp = f"{DIGITAL_TWIN_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(_json_dumps(data, indent=True))
+            os.replace(tmp, DIGITAL_TWIN_PATH)   # readers never see a half-written file
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        with _twin_lock:
+            # A newer save arrived meanwhile — stay pending, the writer runs again
+            if _twin_cache["version"] == version:
+                _twin_cache["pending"] = False
+                _twin_cache["mtime"]   = os.stat(DIGITAL_TWIN_PATH).st_mtime_ns
+
+
+def _twin_writer_loop():
+    while True:
+        _twin_dirty.wait()
+        time.sleep(TWIN_WRITE_DELAY)
+        _twin_dirty.clear()
+        try:
+            _write_twin_file()
+        except Exception as e:
+            print(f"[TWIN] ERROR: background write failed: {e}")
+            _twin_dirty.set()
+
+
+def flush_twin():
+    """Write any pending twin changes now (call before reading the file directly)."""
+    _write_twin_file()
 
 
 def save_twin(dt: dict):
-    with open(DIGITAL_TWIN_PATH, "w") as f:
-        json.dump(dt, f, indent=2)
+    global _twin_writer
+    with _twin_lock:
+        _twin_cache["data"]     = _copy_twin(dt)
+        _twin_cache["version"] += 1
+        _twin_cache["pending"]  = True
+        if _twin_writer is None:
+            _twin_writer = threading.Thread(target=_twin_writer_loop, name="twin-writer", daemon=True)
+            _twin_writer.start()
+    _twin_dirty.set()
+
+
+# The writer is a daemon thread; don't lose the last debounce window on exit
+atexit.register(flush_twin)
 
 
 # ---------------------------------------------------------------------------
@@ -290,8 +550,7 @@ def get_current_occupancy() -> dict:
     and the total number of slots from the digital twin.
     Returns a dict with 'occupied' and 'total' counts.
     """
-    dt = load_twin()
-    total = len(dt["slots"])
+    total = twin_total_slots()
     occupied = get_occupancy_counts()["entries"]
     ratio = round(occupied / total, 4) if total else 0
     print(f"[TOOL:occupancy] occupied={occupied}, total={total}, ratio={ratio}")
@@ -426,65 +685,152 @@ Select the BEST free slot based on preferences and minimum distance. Return only
 ])
 
 
+# Map any vehicle size/category label -> compatible slot sizes
+VEHICLE_SLOT_SIZES = {
+    # Standard slot sizes (direct match)
+    "small":        ["small"],
+    "medium":       ["medium", "large"],
+    "large":        ["large"],
+    # Two-wheelers
+    "bike":         ["small"],
+    "two wheeler":  ["small"],
+    "scooter":      ["small"],
+    # Hatchbacks / small cars
+    "hatchback":    ["small", "medium"],
+    "mini":         ["small"],
+    # Sedans
+    "sedan":        ["medium", "large"],
+    "compact sedan":["medium"],
+    # SUVs and larger
+    "suv":          ["medium", "large"],
+    "luxury suv":   ["large"],
+    "premium suv":  ["large"],
+    "compact suv":  ["medium"],
+    # Other categories
+    "van":          ["large"],
+    "truck":        ["large"],
+    "mpv":          ["medium", "large"],
+    "electric":     ["small", "medium", "large"],
+    "coupe":        ["medium"],
+    "convertible":  ["medium"],
+}
+UNKNOWN_VEHICLE_SLOT_SIZES = ["medium", "large"]  # fallback: medium+ for unknown
+
+
 def size_compatible_strict(slot_size: str, vehicle_size: str) -> bool:
-    # Map new categories to base slot sizes
-    # Map any vehicle size/category label -> compatible slot sizes
-    mapping = {
-        # Standard slot sizes (direct match)
-        "small":        ["small"],
-        "medium":       ["medium", "large"],
-        "large":        ["large"],
-        # Two-wheelers
-        "bike":         ["small"],
-        "two wheeler":  ["small"],
-        "scooter":      ["small"],
-        # Hatchbacks / small cars
-        "hatchback":    ["small", "medium"],
-        "mini":         ["small"],
-        # Sedans
-        "sedan":        ["medium", "large"],
-        "compact sedan":["medium"],
-        # SUVs and larger
-        "suv":          ["medium", "large"],
-        "luxury suv":   ["large"],
-        "premium suv":  ["large"],
-        "compact suv":  ["medium"],
-        # Other categories
-        "van":          ["large"],
-        "truck":        ["large"],
-        "mpv":          ["medium", "large"],
-        "electric":     ["small", "medium", "large"],
-        "coupe":        ["medium"],
-        "convertible":  ["medium"],
-    }
-    v_lower = vehicle_size.lower().strip()
-    allowed_slots = mapping.get(v_lower, ["medium", "large"])  # fallback: medium+ for unknown
+    allowed_slots = VEHICLE_SLOT_SIZES.get(vehicle_size.lower().strip(), UNKNOWN_VEHICLE_SLOT_SIZES)
     return slot_size.lower() in allowed_slots
 
 
+# ---------------------------------------------------------------------------
+# Structure-of-arrays view of the twin for vectorised slot filtering
+# ---------------------------------------------------------------------------
+# Rebuilt only when the twin cache holds a different twin version; slot
+# allocations made through _occupy_slot patch it in place instead.
+
+SLOT_SIZE_CODES = {"small": 0, "medium": 1, "large": 2}
+
+_slot_soa = {"version": None}
+
+
+@lru_cache(maxsize=64)
+def _size_mask(vehicle_size: str) -> np.ndarray:
+    """
+    Boolean lookup table indexed by slot size code: mask[soa["size"]] gives
+    per-slot compatibility in one gather. The extra trailing False entry is
+    what unknown slot sizes (code -1) index into.
+    """
+    mask = np.zeros(len(SLOT_SIZE_CODES) + 1, dtype=bool)
+    for name, code in SLOT_SIZE_CODES.items():
+        mask[code] = size_compatible_strict(name, vehicle_size)
+    mask.setflags(write=False)   # shared via the cache
+    return mask
+
+
+def _twin_soa() -> dict:
+    with _twin_lock:
+        slots = _cached_twin()["slots"]
+        if _slot_soa["version"] != _twin_cache["version"]:
+            _slot_soa.update(
+                version=_twin_cache["version"],
+                ids=np.array([s["id"] for s in slots], dtype=np.int64),
+                dist=np.array([s["distance"] for s in slots], dtype=np.float32),
+                size=np.array([SLOT_SIZE_CODES.get(s["size"], -1) for s in slots], dtype=np.int8),
+                free=np.array([s["status"] == "free" for s in slots], dtype=bool),
+            )
+        return {**_slot_soa, "slots": slots}
+
+
+def _occupy_slot(slot_id: int) -> Optional[dict]:
+    """
+    Mark slot_id occupied in the twin if it is still free. Returns the slot
+    dict, or None if the slot is unknown or was taken since candidates were
+    picked (the check and the update share _twin_lock).
+    """
+    with _twin_lock:
+        soa  = _twin_soa()
+        hits = np.flatnonzero(soa["ids"] == slot_id)
+        if not hits.size:
+            return None
+        pos = int(hits[0])
+
+        dt = load_twin()
+        s  = dt["slots"][pos]
+        if s["status"] != "free":
+            print(f"[SLOT] Slot {slot_id} is '{s['status']}', no longer free")
+            return None
+        s["status"] = "occupied"
+        save_twin(dt)
+
+        soa["free"][pos]     = False
+        _slot_soa["version"] = _twin_cache["version"]
+        return s
+
+
+def _build_slot_chain():
+    # Prompt -> LLM -> JSON in one LCEL pipeline; rebuilt by set_model()
+    return slot_prompt | llm | JsonOutputParser()
+
+
+_slot_chain = _build_slot_chain()
+
+
+@lru_cache(maxsize=256)
+def _llm_pick_slot(slots_json: str, vehicle_json: str) -> int:
+    """
+    Ask the LLM to pick one slot, memoised on the exact prompt inputs.
+
+    The key embeds the candidate slots themselves, so a cache hit can only
+    return a slot that is free in the current twin — no invalidation needed
+    when save_twin changes statuses. Failures raise and are not cached.
+    """
+    with _llm_slots:
+        parsed = _slot_chain.invoke({"slots": slots_json, "vehicle": vehicle_json})
+    print(f"[SLOT] Parsed LLM response: {parsed}")
+    slot_id = parsed.get("slot_id") if isinstance(parsed, dict) else None
+    if slot_id is None:
+        raise ValueError("slot_id missing in JSON")
+    return slot_id
+
+
 def llm_select_slot(vehicle: Dict[str, Any]) -> Optional[int]:
-    dt = load_twin()
     size  = vehicle.get("size", "medium")
     plate = vehicle.get("plate", "UNKNOWN")
 
     print(f"[SLOT] Finding slot for {plate} (size: {size}) | MOCK_MODE={MOCK_MODE}")
     # Note: full twin dump removed to avoid flooding logs with 170 slots
 
-    free = [
-        s for s in dt["slots"]
-        if s["status"] == "free" and size_compatible_strict(s["size"], size)
-    ]
-    # Sort by distance so closest slots come first
-    free.sort(key=lambda s: s["distance"])
+    soa = _twin_soa()
+    idx = np.flatnonzero(soa["free"] & _size_mask(size)[soa["size"]])
+    # Sort by distance so closest slots come first (stable: ties keep twin order)
+    idx = idx[np.argsort(soa["dist"][idx], kind="stable")]
+    free = [soa["slots"][i] for i in idx]
     print(f"[SLOT] Filtered free slots ({len(free)} total): {[s['id'] for s in free[:10]]}...")
 
     if not free:
         print(f"[SLOT] No free {size} slots available!")
-        for slot_size in ["small", "medium", "large"]:
-            count = sum(
-                1 for s in dt["slots"]
-                if s["size"] == slot_size and s["status"] == "free"
-            )
+        for slot_size, code in SLOT_SIZE_CODES.items():
+            count = int(np.count_nonzero(soa["free"] & (soa["size"] == code)))
             print(f"  - {slot_size}: {count} free")
         return None
 
@@ -496,49 +842,48 @@ def llm_select_slot(vehicle: Dict[str, Any]) -> Optional[int]:
     elif MOCK_MODE:
         slot_id = min(free, key=lambda s: s["distance"])["id"]
         print(f"[SLOT] MOCK_MODE: Selected closest slot {slot_id}")
+    elif not (vehicle.get("preferences") or "").strip():
+        # Without preferences the prompt's rule reduces to "smallest distance",
+        # which `free` (sorted by distance) already answers — skip the LLM.
+        slot_id = free[0]["id"]
+        print(f"[SLOT] No preferences: selected closest slot {slot_id}")
     else:
         try:
-            # Only send the 10 closest candidates to the LLM to keep prompt small
+            # Only send the 10 closest candidates to the LLM to keep prompt small.
+            # Plate/model don't affect the choice, so they're left out of the
+            # prompt — consecutive vehicles with the same needs share a cache hit.
             candidates = free[:10]
-            msg = slot_prompt.invoke({
-                "slots": json.dumps(candidates),
-                "vehicle": json.dumps(vehicle),
-            })
-            res = llm.invoke(msg)
-            res_text = _extract_text(res.content)
-            print(f"[SLOT] Raw LLM response: {res_text}")
-            match = re.search(r'\{.*\}', res_text)
-            if not match:
-                raise ValueError("No JSON found in LLM response")
-            slot_json = match.group()
-            slot_id = json.loads(slot_json).get("slot_id")
-            if slot_id is None:
-                raise ValueError("slot_id missing in JSON")
+            slot_id = _llm_pick_slot(
+                _json_dumps(candidates),
+                _json_dumps({"size": size, "preferences": vehicle.get("preferences", "")}),
+            )
             print(f"[SLOT] LLM selected slot {slot_id}")
         except Exception as e:
             print(f"[SLOT] LLM error, using closest fallback: {e}")
             slot_id = min(free, key=lambda s: s["distance"])["id"]
             print(f"[SLOT] Fallback to closest slot: {slot_id}")
 
-    for s in dt["slots"]:
-        if s["id"] == slot_id:
-            if s["status"] != "free":
-                print(f"[SLOT] WARNING: Slot {slot_id} status is '{s['status']}', not 'free'!")
-            s["status"] = "occupied"
-            save_twin(dt)
+    # Candidates were read without the twin lock and the LLM pick ran
+    # unlocked, so a concurrent allocation may have taken the slot; fall
+    # back to the next free candidate by distance instead of overwriting
+    for candidate in [slot_id] + [s["id"] for s in free if s["id"] != slot_id]:
+        s = _occupy_slot(candidate)
+        if s is not None:
             print(
-                f"[SLOT] Assigned slot {slot_id} "
+                f"[SLOT] Assigned slot {candidate} "
                 f"(size: {s['size']}, distance: {s['distance']}m)"
             )
-            return slot_id
+            return candidate
 
-    print(f"[SLOT] ERROR: Could not mark slot {slot_id} as occupied")
+    print(f"[SLOT] ERROR: No candidate slot for {plate} was still free")
     return None
 
 
 # ---------------------------------------------------------------------------
 # LangGraph state definition
 # ---------------------------------------------------------------------------
+# Nodes return only the keys they change. Slot and pricing run as parallel
+# branches, so `steps` is summed across nodes instead of overwritten.
 
 class EntryState(TypedDict, total=False):
     plate: str
@@ -553,7 +898,7 @@ class EntryState(TypedDict, total=False):
     reservation_messages: list
     pricing_messages: list
     persist_messages: list
-    steps: int
+    steps: Annotated[int, operator.add]
     start_time: float
 
 
@@ -592,7 +937,6 @@ def reservation_node(state: EntryState) -> EntryState:
     if not plate:
         print("[RESERVATION AGENT] ERROR: No plate in state")
         return {
-            **state,
             "status": "error",
             "message": "No plate provided to reservation agent",
         }
@@ -607,7 +951,7 @@ def reservation_node(state: EntryState) -> EntryState:
         },
     ]
 
-    steps = state.get("steps", 0)
+    steps = 0
 
     tool_executor = ToolNode(reservation_tools)
 
@@ -641,7 +985,8 @@ def reservation_node(state: EntryState) -> EntryState:
         steps += 2
     else:
         for step in range(6):
-            response = reservation_llm.invoke(messages)
+            with _llm_slots:
+                response = reservation_llm.invoke(messages)
             messages.append(response)
 
             tool_calls = getattr(response, "tool_calls", None)
@@ -651,7 +996,7 @@ def reservation_node(state: EntryState) -> EntryState:
                 try:
                     match = re.search(r'\{.*?\}', _extract_text(response.content), re.DOTALL)
                     if match:
-                        parsed        = json.loads(match.group())
+                        parsed        = _json_loads(match.group())
                         final_status  = parsed.get("status", "no_booking")
                         final_message = parsed.get("message", "")
                         booking_model = parsed.get("model")
@@ -673,7 +1018,6 @@ def reservation_node(state: EntryState) -> EntryState:
         # Fetch full record so downstream nodes have the complete booking dict
         booking = get_booking_by_plate(plate) or {}
         return {
-            **state,
             "status":  "booked",
             "booking": booking,
             "model":   booking_model,
@@ -684,7 +1028,6 @@ def reservation_node(state: EntryState) -> EntryState:
         }
 
     return {
-        **state,
         "status":  final_status,
         "message": final_message,
         "reservation_messages": messages,
@@ -713,13 +1056,12 @@ def slot_node(state: EntryState) -> EntryState:
     if not slot:
         print(f"[SLOT] No compatible {size} slot available for {plate}")
         return {
-            **state,
             "status":  "no_slot",
             "message": f"No {size} slot available",
         }
 
     print(f"[SLOT] Assigned slot {slot} to {plate}")
-    return {**state, "slot_id": slot, "steps": state.get("steps", 0) + 1}
+    return {"slot_id": slot, "steps": 1}
 
 
 # ---------------------------------------------------------------------------
@@ -741,12 +1083,12 @@ Do NOT skip either tool call. Do NOT invent occupancy numbers."""
 def pricing_node(state: EntryState) -> EntryState:
     """Fully agentic pricing node using a ReAct loop."""
     print("[PRICING AGENT] Starting agentic pricing loop ...")
-    steps = state.get("steps", 0)
+    steps = 0
     status = state.get("status")
 
     if status not in ["booked", "entered"]:
         print(f"[PRICING AGENT] Skipping (status={status})")
-        return state
+        return {}
 
     messages = [
         {"role": "system", "content": _PRICING_SYSTEM},
@@ -767,7 +1109,8 @@ def pricing_node(state: EntryState) -> EntryState:
         steps += 2
     else:
         for step in range(6):
-            response = pricing_llm.invoke(messages)
+            with _llm_slots:
+                response = pricing_llm.invoke(messages)
             messages.append(response)
 
             tool_calls = getattr(response, "tool_calls", None)
@@ -776,7 +1119,7 @@ def pricing_node(state: EntryState) -> EntryState:
                 try:
                     match = re.search(r'\{.*?\}', _extract_text(response.content), re.DOTALL)
                     if match:
-                        price = float(json.loads(match.group()).get("price", BASE_PRICE))
+                        price = float(_json_loads(match.group()).get("price", BASE_PRICE))
                 except Exception as e:
                     print(f"[PRICING AGENT] Could not parse price: {e}")
                 break
@@ -788,7 +1131,7 @@ def pricing_node(state: EntryState) -> EntryState:
                 print(f"[PRICING AGENT] Tool result: {tm.content}")
 
     print(f"[PRICING AGENT] Final price: INR {price}")
-    return {**state, "price": price, "pricing_messages": messages, "steps": steps}
+    return {"price": price, "pricing_messages": messages, "steps": steps}
 
 
 # ---------------------------------------------------------------------------
@@ -817,12 +1160,12 @@ def persist_node(state: EntryState) -> EntryState:
     price   = state.get("price", BASE_PRICE)
 
     print(f"[PERSIST AGENT] Starting agentic persist loop for {plate} ...")
-    steps = state.get("steps", 0)
+    steps = 0
     status = state.get("status")
 
     if status != "booked" or not slot_id:
         print(f"[PERSIST AGENT] Skipping persistence (status={status}, slot={slot_id})")
-        return state
+        return {}
 
     user_msg = (
         f"Persist the parking entry for vehicle {plate}.\n"
@@ -852,7 +1195,8 @@ def persist_node(state: EntryState) -> EntryState:
         steps += 2
     else:
         for step in range(8):
-            response = persist_llm.invoke(messages)
+            with _llm_slots:
+                response = persist_llm.invoke(messages)
             messages.append(response)
 
             tool_calls = getattr(response, "tool_calls", None)
@@ -861,7 +1205,7 @@ def persist_node(state: EntryState) -> EntryState:
                 try:
                     match = re.search(r'\{.*?\}', _extract_text(response.content), re.DOTALL)
                     if match:
-                        parsed        = json.loads(match.group())
+                        parsed        = _json_loads(match.group())
                         final_status  = parsed.get("status", "error")
                         final_message = parsed.get("message", "")
                 except Exception as e:
@@ -876,7 +1220,6 @@ def persist_node(state: EntryState) -> EntryState:
 
     print(f"[PERSIST AGENT] status={final_status} | {final_message}")
     return {
-        **state,
         "status":  final_status,
         "message": final_message,
         "persist_messages": messages,
@@ -888,52 +1231,96 @@ def persist_node(state: EntryState) -> EntryState:
 # Router
 # ---------------------------------------------------------------------------
 
-def router(state: EntryState) -> str:
-    """Route to slot assignment or terminate based on reservation outcome."""
+def router(state: EntryState):
+    """
+    Terminate on a failed reservation; otherwise fan out to slot assignment
+    and pricing, which only depend on the reservation result and run in
+    parallel.
+    """
     status = state.get("status")
     print(f"[ROUTER] Current status: {status}")
     if status in ["no_booking", "no_slot", "error"]:
         return END
-    return "slot"
+    return ["slot", "pricing"]
 
 
 # ---------------------------------------------------------------------------
-# Entry agent — master LangGraph pipeline
+# Node cache keys
 # ---------------------------------------------------------------------------
 
-def entry_recognition_agent(vision_payload: Dict[str, Any]) -> Dict[str, Any]:
-    plate = vision_payload.get("plate")
-    if not plate:
-        return {"status": "no_plate"}
+RESERVATION_CACHE_TTL = 5   # seconds
+PRICING_CACHE_TTL     = 1   # seconds
+
+def _reservation_cache_key(state: EntryState) -> str:
+    """
+    Plate plus the booking's current DB status. Once a vehicle is admitted its
+    booking status moves on, so a cached "booked" verdict can't re-admit it.
+    """
+    plate   = state.get("plate")
+    booking = get_booking_by_plate(plate) if plate else None
+    return f"{plate}|{(booking or {}).get('status')}"
+
+
+def _pricing_cache_key(state: EntryState) -> str:
+    """
+    Price depends only on occupancy and preferences; a one-second time bucket
+    bounds how stale the occupancy behind a cached price can be.
+    """
+    prefs = state.get("booking", {}).get("preferences", "")
+    return f"{state.get('status')}|{prefs}|{int(time.time())}"
 
-    print(f"\n{'='*60}")
-    print(f"[ENTRY AGENT] Starting workflow for plate: {plate} | MOCK_MODE={MOCK_MODE}")
-    print(f"{'='*60}\n")
 
+# ---------------------------------------------------------------------------
+# Entry agent — master LangGraph pipeline
+# ---------------------------------------------------------------------------
+
+def _build_entry_graph():
+    """
+    Wire and compile the entry pipeline. Done once at import: the graph's
+    structure never changes, and nodes resolve the (swappable) LLMs at call
+    time, so set_model() needs no rebuild. State is per-invocation.
+    """
     graph = StateGraph(EntryState)
-    graph.add_node("reservation", reservation_node)
+    graph.add_node("reservation", reservation_node,
+                   cache_policy=CachePolicy(key_func=_reservation_cache_key,
+                                            ttl=RESERVATION_CACHE_TTL))
     graph.add_node("slot",        slot_node)
-    graph.add_node("pricing",     pricing_node)
+    graph.add_node("pricing",     pricing_node,
+                   cache_policy=CachePolicy(key_func=_pricing_cache_key,
+                                            ttl=PRICING_CACHE_TTL))
     graph.add_node("persist",     persist_node)
 
     graph.set_entry_point("reservation")
     graph.add_conditional_edges(
         "reservation",
         router,
-        {"slot": "slot", END: END}
+        {"slot": "slot", "pricing": "pricing", END: END}
     )
-    graph.add_edge("slot",    "pricing")
-    graph.add_edge("pricing", "persist")
+    # Join: persist waits for both parallel branches
+    graph.add_edge(["slot", "pricing"], "persist")
     graph.add_edge("persist", END)
 
-    entry_graph = graph.compile()
+    # Slot and persist mutate state and are never cached
+    return graph.compile(cache=InMemoryCache())
+
+
+_ENTRY_GRAPH = _build_entry_graph()
+
+
+def entry_recognition_agent(vision_payload: Dict[str, Any]) -> Dict[str, Any]:
+    plate = vision_payload.get("plate")
+    if not plate:
+        return {"status": "no_plate"}
+
+    print(f"\n{'='*60}")
+    print(f"[ENTRY AGENT] Starting workflow for plate: {plate} | MOCK_MODE={MOCK_MODE}")
+    print(f"{'='*60}\n")
 
     try:
-        import time
         initial_state: EntryState = {"plate": plate, "steps": 0, "start_time": time.time()}
         print(f"[ENTRY AGENT] Initial state: {initial_state}")
 
-        result = entry_graph.invoke(initial_state)
+        result = _ENTRY_GRAPH.invoke(initial_state)
         
         result["latency"] = time.time() - result["start_time"]
 
@@ -3,60 +3,452 @@ backend/flask_backend.py
 Flask REST API — Smart Parking System
 """
 from flask import Flask, request, jsonify
-from agentic import vision_agent_process, entry_recognition_agent
-import os, json
+from flask.json.provider import DefaultJSONProvider
+from agentic import (
+    vision_agent_process_bytes,
+    vision_agent_process_batch,
+    entry_recognition_agent,
+    load_twin,
+    save_twin,
+)
+from sqlite_helper import log_plate_detections_bulk, checkpoint_wal
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import cv2
+import numpy as np
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
+from werkzeug.datastructures import MultiDict
+
+# Optional: PyAV decodes straight to ndarrays with threaded decoding;
+# cv2.VideoCapture is the fallback when it isn't installed (and is used
+# instead whenever OpenCV can decode on the GPU).
+try:
+    import av
+except ImportError:
+    av = None
+
+# Optional: streaming-form-data writes multipart uploads straight to disk as
+# chunks arrive; Werkzeug's form parser is the fallback.
+try:
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import FileTarget, ValueTarget
+except ImportError:
+    StreamingFormDataParser = None
+
+# Optional: orjson encodes jsonify() responses (large /process-video
+# payloads included); Flask's stdlib-json provider is the fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv(override=True)
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-# Path to the digital twin — resolved relative to this file so it works
-# regardless of the working directory the server is launched from.
-DIGITAL_TWIN_PATH = Path(__file__).parent / "mock_digital_twin.json"
+VIDEO_SAMPLE_FPS = 5   # frames per second of video handed to the vision agent
+VIDEO_BATCH_SIZE = 8   # sampled frames per YOLO forward pass
+VIDEO_MAX_BATCH  = 64  # upper bound on a client-supplied batch_size
+VIDEO_QUEUE_SIZE = 16  # decoded frames buffered ahead of inference
+VIDEO_DWELL_REUSE = True  # reuse the previous sampled frame's result when its dHash repeats
+
+UPLOAD_DIR        = Path(tempfile.gettempdir()) / "smart_parking_uploads"
+UPLOAD_CHUNK_SIZE = 64 * 1024   # bytes read from the request stream at a time
+UPLOAD_COPY_BUFFER = 1 << 20    # 1 MiB copy buffer for the Werkzeug fallback
+
+# Hardware video decode (NVDEC / QSV / VideoToolbox via OpenCV's FFmpeg
+# backend). Probed per codec and remembered, so one codec the device can't
+# decode (or one bad file) doesn't turn it off for the rest; set
+# VIDEO_HW_DECODE=false to force the CPU path (e.g. CI).
+VIDEO_HW_DECODE = os.getenv("VIDEO_HW_DECODE", "true").lower() == "true"
+_hw_decode = {}   # codec name -> accelerated?; missing = not probed yet
 
 app = Flask(__name__)
 
 
-# ── helpers ──────────────────────────────────────────────────────────────────
+if orjson:
+    class OrjsonProvider(DefaultJSONProvider):
+        """jsonify()/request.get_json() backed by orjson"""
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
 
-def _load_twin() -> dict:
-    with open(DIGITAL_TWIN_PATH) as f:
-        return json.load(f)
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=self.option).decode()
 
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
 
-def _save_twin(dt: dict):
-    with open(DIGITAL_TWIN_PATH, "w") as f:
-        json.dump(dt, f, indent=2)
+        def response(self, *args, **kwargs):
+            # Hand Flask the encoded bytes directly — no str round-trip
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=self.option),
+                mimetype=self.mimetype,
+            )
 
+    app.json = OrjsonProvider(app)
+
+
+# ── helpers ──────────────────────────────────────────────────────────────────
 
 def _free_slot_in_twin(slot_id: int):
-    """Mark a slot as free in the digital twin."""
-    dt = _load_twin()
+    """
+    Mark a slot as free in the digital twin.
+    Goes through agentic's load_twin/save_twin so the in-memory twin cache
+    used by slot allocation sees the freed slot immediately.
+    """
+    dt = load_twin()
     for s in dt["slots"]:
         if s["id"] == slot_id:
             s["status"] = "free"
-            _save_twin(dt)
+            save_twin(dt)
             return True
     return False
 
 
+def _receive_upload(field_names=()):
+    """
+    Save the multipart `file` field into UPLOAD_DIR and collect the named
+    plain form fields. Returns (saved_path, form MultiDict).
+    Raises ValueError if no usable file was sent.
+    """
+    UPLOAD_DIR.mkdir(exist_ok=True)
+
+    if StreamingFormDataParser is None:
+        if "file" not in request.files:
+            raise ValueError("No file provided")
+        file = request.files["file"]
+        if file.filename == "":
+            raise ValueError("Empty filename")
+        saved_path = UPLOAD_DIR / file.filename
+        with open(saved_path, "wb") as dst:
+            shutil.copyfileobj(file.stream, dst, length=UPLOAD_COPY_BUFFER)
+        return saved_path, request.form
+
+    if request.mimetype != "multipart/form-data":
+        raise ValueError("No file provided")
+
+    # Stream into a scratch file; the real name is only known once parsed
+    fd, part_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    os.close(fd)
+    try:
+        parser      = StreamingFormDataParser(headers=request.headers)
+        file_target = FileTarget(part_path)
+        parser.register("file", file_target)
+        values = {name: ValueTarget() for name in field_names}
+        for name, target in values.items():
+            parser.register(name, target)
+
+        while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+            parser.data_received(chunk)
+
+        filename = file_target.multipart_filename
+        if filename is None:
+            raise ValueError("No file provided")
+        if filename == "":
+            raise ValueError("Empty filename")
+
+        saved_path = UPLOAD_DIR / filename
+        os.replace(part_path, saved_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    form = MultiDict({name: t.value.decode() for name, t in values.items() if t.value})
+    return saved_path, form
+
+
+def _valid_fps(raw) -> float:
+    """Container-reported FPS as a float, or 30 when it's missing/nonsensical."""
+    try:
+        fps = float(raw or 0)
+    except (TypeError, ValueError):
+        return 30.0
+    return fps if 0 < fps <= 1000 else 30.0   # also rejects NaN
+
+
+def _open_hw_capture(video_path: Path):
+    """
+    Try to open the video with hardware-accelerated decoding.
+    Returns (capture, accelerated) or (None, False) if it won't open.
+    """
+    if not hasattr(cv2, "VIDEO_ACCELERATION_ANY"):   # OpenCV < 4.5.2
+        return None, False
+    cap = cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+    ])
+    if not cap.isOpened():
+        return None, False
+    accel = cap.get(cv2.CAP_PROP_HW_ACCELERATION)
+    return cap, bool(accel) and accel != cv2.VIDEO_ACCELERATION_NONE
+
+
+def _open_software(video_path: Path):
+    """CPU decode: PyAV if installed, else cv2.VideoCapture."""
+    if av is not None:
+        try:
+            container = av.open(str(video_path))
+        except Exception as e:
+            raise ValueError("Cannot open video file") from e
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"   # frame + slice threading in libavcodec
+        return container, _valid_fps(stream.average_rate)
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError("Cannot open video file")
+    return cap, _valid_fps(cap.get(cv2.CAP_PROP_FPS))
+
+
+def _open_video(video_path: Path):
+    """
+    Open a video for decoding. Returns (handle, fps).
+    Prefers hardware decode, then PyAV, then plain cv2.VideoCapture.
+    Raises ValueError if the file cannot be opened.
+    """
+    if not VIDEO_HW_DECODE:
+        return _open_software(video_path)
+    if av is None:
+        # Without PyAV the OpenCV capture is the software path too, so there
+        # is nothing to cache: take it accelerated or not
+        cap, accelerated = _open_hw_capture(video_path)
+        if cap is None:
+            return _open_software(video_path)   # raises ValueError
+        print(f"[VIDEO] Hardware decode {'active' if accelerated else 'unavailable'}")
+        return cap, _valid_fps(cap.get(cv2.CAP_PROP_FPS))
+
+    # The PyAV open only parses the header; it names the codec to probe
+    handle, fps = _open_software(video_path)
+    codec = handle.streams.video[0].codec_context.name
+    if _hw_decode.get(codec) is False:
+        return handle, fps
+
+    cap, accelerated = _open_hw_capture(video_path)
+    if cap is None:
+        return handle, fps   # this file only; nothing learnt about the codec
+    if codec not in _hw_decode:
+        _hw_decode[codec] = accelerated
+        print(f"[VIDEO] Hardware decode for {codec}: {'available' if accelerated else 'unavailable'}")
+    if accelerated:
+        handle.close()
+        return cap, _valid_fps(cap.get(cv2.CAP_PROP_FPS))
+    cap.release()
+    return handle, fps
+
+
+def _sampled_frames(video, frame_interval: int, meta: dict):
+    """
+    Yield (frame_index, BGR ndarray) for every `frame_interval`-th frame and
+    release the handle when done. Sets meta["total_frames"] on exit.
+    """
+    frame_count = 0
+    next_sample = 0   # next sampled index; replaces a per-frame modulo
+    is_capture  = isinstance(video, cv2.VideoCapture)
+    try:
+        if not is_capture:
+            for frame in video.decode(video.streams.video[0]):
+                if frame_count == next_sample:
+                    next_sample += frame_interval
+                    yield frame_count, frame.to_ndarray(format="bgr24")
+                frame_count += 1
+        else:
+            # grab() advances without the YUV->BGR conversion and copy that
+            # read() does; only the sampled frames are retrieve()d
+            while video.grab():
+                if frame_count == next_sample:
+                    next_sample += frame_interval
+                    ret, frame = video.retrieve()
+                    if ret and frame is not None and frame.size:
+                        yield frame_count, frame
+                frame_count += 1
+    finally:
+        meta["total_frames"] = frame_count
+        if is_capture:
+            video.release()
+        else:
+            video.close()
+
+
+def _decode_in_background(frames, maxsize: int = VIDEO_QUEUE_SIZE):
+    """
+    Drive the `frames` generator on a decoder thread and yield its items via
+    a bounded queue, so decoding the next frames overlaps with inference on
+    the caller's thread. Decoder errors are re-raised in the caller.
+    """
+    q    = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def _put(item) -> bool:
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop():
+        try:
+            for item in frames:
+                if not _put(item):
+                    break
+        except Exception as e:
+            _put(e)
+        finally:
+            frames.close()   # runs _sampled_frames' cleanup on this thread
+            _put(done)
+
+    decoder = threading.Thread(target=_decode_loop, name="video-decode", daemon=True)
+    decoder.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        decoder.join()
+
+
+def _range_frames(video_path: Path, start: int, stop: int, frame_interval: int):
+    """
+    Yield (frame_index, BGR ndarray) for the sampled frames in [start, stop)
+    from a capture of its own — captures can't be shared between threads.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    next_sample = -(-start // frame_interval) * frame_interval   # first multiple >= start
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+                # Seeking isn't frame-accurate for every backend/codec; reopen
+                # and grab() up to `start` so the sampled indices stay exact
+                print(f"[VIDEO] Seek to frame {start} inexact; decoding sequentially")
+                cap.release()
+                cap = cv2.VideoCapture(str(video_path))
+                for _ in range(start):
+                    if not cap.grab():
+                        return
+        for idx in range(start, stop):
+            if not cap.grab():
+                break
+            if idx == next_sample:
+                next_sample += frame_interval
+                ret, frame = cap.retrieve()
+                if ret and frame is not None and frame.size:
+                    yield idx, frame
+    finally:
+        cap.release()
+
+
+def _frame_count(video) -> int:
+    """Container-reported frame count of an open handle; 0 when unknown."""
+    if isinstance(video, cv2.VideoCapture):
+        return max(0, int(video.get(cv2.CAP_PROP_FRAME_COUNT)))
+    return video.streams.video[0].frames or 0
+
+
+def _frame_dhash(frame) -> bytes:
+    """64-bit difference hash of a BGR frame (9x8 greyscale downsample)."""
+    small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (9, 8),
+                       interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+
+
+def _detect_plates(frames, batch_size: int) -> list:
+    """
+    Run (frame_index, frame) pairs through the vision agent in batches of
+    `batch_size`. Returns [(frame_index, plate, detected_at)] for frames
+    with a plate; detections are logged by the caller in one bulk insert.
+
+    A frame whose dHash equals the previous sampled frame's (a car sitting
+    at the gate) reuses that frame's result instead of going through the
+    model. Only the immediately preceding frame is compared: the hash is
+    far coarser than a plate, so a match against older frames could hand
+    a later car an earlier car's plate.
+    """
+    hits    = []
+    batch   = []                 # (frame_index, frame) awaiting one YOLO pass
+    waiting = []                 # (frame_index, batch position) of repeats of a queued frame
+    prev    = {"dhash": None, "pos": None, "plate": None}   # last non-repeat sampled frame
+
+    def _record(idx, plate, detected_at):
+        if plate:
+            hits.append((idx, plate, detected_at))
+            print(f"[VIDEO] Frame {idx}: {plate}")
+
+    def _flush_batch():
+        visions     = vision_agent_process_batch([f for _, f in batch], log_detections=False)
+        detected_at = datetime.utcnow().isoformat()
+        plates      = [vision.get("plate") for vision in visions]
+        for (idx, _), plate in zip(batch, plates):
+            _record(idx, plate, detected_at)
+        for idx, pos in waiting:
+            _record(idx, plates[pos], detected_at)
+        if prev["pos"] is not None:
+            prev["plate"], prev["pos"] = plates[prev["pos"]], None
+        batch.clear()
+        waiting.clear()
+
+    for idx, frame in frames:
+        dhash = _frame_dhash(frame) if VIDEO_DWELL_REUSE else None
+        if dhash is not None and dhash == prev["dhash"]:
+            if prev["pos"] is None:
+                _record(idx, prev["plate"], datetime.utcnow().isoformat())
+            else:
+                waiting.append((idx, prev["pos"]))
+            continue
+        prev["dhash"], prev["pos"] = dhash, len(batch)
+        batch.append((idx, frame))
+        if len(batch) >= batch_size:
+            _flush_batch()
+    if batch:
+        _flush_batch()
+    hits.sort()   # repeats resolved at flush time land out of order
+    return hits
+
+
+def _detect_plates_parallel(video_path: Path, total_frames: int, frame_interval: int,
+                            batch_size: int, num_workers: int) -> list:
+    """
+    Split the video into `num_workers` contiguous frame ranges, decode and
+    detect each on its own thread, and merge hits back into frame order.
+    """
+    # Range boundaries on multiples of frame_interval keep the sampled set
+    # identical to a sequential pass
+    step   = -(-total_frames // num_workers)
+    step   = -(-step // frame_interval) * frame_interval
+    ranges = [(start, min(start + step, total_frames)) for start in range(0, total_frames, step)]
+
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="video-range") as pool:
+        chunks = pool.map(
+            lambda r: _detect_plates(_range_frames(video_path, r[0], r[1], frame_interval), batch_size),
+            ranges,
+        )
+        return sorted(hit for chunk in chunks for hit in chunk)
+
+
 def get_majority_value(values):
-    counts = {}
-    for v in values:
-        counts[v] = counts.get(v, 0) + 1
-    majority_value = max(counts, key=counts.get)
-    return majority_value, counts
+    counts = Counter(values)
+    majority_value = counts.most_common(1)[0][0]
+    return majority_value, dict(counts)
 
 
 def get_most_frequent_plate(plate_detections):
     if not plate_detections:
         return None, {}
-    from collections import Counter
-    plate_counts = Counter(plate_detections)
-    most_common_plate = plate_counts.most_common(1)[0][0]
-    return most_common_plate, dict(plate_counts)
+    return get_majority_value(plate_detections)
 
 
 # ── health ───────────────────────────────────────────────────────────────────
@@ -128,7 +520,7 @@ def detect_plate():
             return jsonify({"status": "error", "message": "Empty filename"}), 400
 
         image_bytes = file.read()
-        vision = vision_agent_process(image_bytes)
+        vision = vision_agent_process_bytes(image_bytes)
 
         if not vision.get("plate"):
             return jsonify({"status": "no_plate_detected"})
@@ -172,7 +564,7 @@ def prebook_allocate():
         prefs = data.get("preferences", "")
         
         from agentic import llm_select_slot, get_current_occupancy, calculate_dynamic_price
-        from sqlite_helper import get_conn
+        from sqlite_helper import set_booking_slot
         
         # Allocate the best slot via the LLM slot-selection logic
         slot_id = llm_select_slot({"plate": plate, "size": size, "preferences": prefs})
@@ -188,10 +580,7 @@ def prebook_allocate():
         if slot_id:
             # Mark slot as reserved in digital twin (already done inside llm_select_slot)
             # Update the booking record with the assigned slot
-            conn = get_conn()
-            cur = conn.cursor()
-            cur.execute("UPDATE bookings SET slot_id=? WHERE plate=?", (slot_id, plate))
-            conn.close()
+            set_booking_slot(plate, slot_id)
             
             return jsonify({"status": "success", "slot_id": slot_id, "price": price_result})
         else:
@@ -252,18 +641,10 @@ def vehicle_exit():
 @app.route("/upload-video", methods=["POST"])
 def upload_video():
     try:
-        if "file" not in request.files:
-            return jsonify({"status": "error", "message": "No file provided"}), 400
-
-        file = request.files["file"]
-        if file.filename == "":
-            return jsonify({"status": "error", "message": "Empty filename"}), 400
-
-        import tempfile
-        temp_dir = Path(tempfile.gettempdir()) / "smart_parking_uploads"
-        temp_dir.mkdir(exist_ok=True)
-        video_path = temp_dir / file.filename
-        file.save(str(video_path))
+        try:
+            video_path, _ = _receive_upload()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
 
         return jsonify({
             "status":  "uploaded",
@@ -282,49 +663,54 @@ def process_video():
     """
     Upload and process a video file.
     Samples at 5 FPS, applies majority-vote plate selection, runs entry pipeline.
+
+    Optional form fields:
+      interval   — process every Nth frame (default: derived from 5 FPS)
+      batch_size — sampled frames per YOLO forward pass (default 8; capped at 64)
+      num_workers — decode/detect this many frame ranges in parallel
+                    (default 1; capped at the CPU count)
     """
     try:
-        if "file" not in request.files:
-            return jsonify({"status": "error", "message": "No file provided"}), 400
-
-        file = request.files["file"]
-        if file.filename == "":
-            return jsonify({"status": "error", "message": "Empty filename"}), 400
-
-        import tempfile, cv2
-        temp_dir = Path(tempfile.gettempdir()) / "smart_parking_uploads"
-        temp_dir.mkdir(exist_ok=True)
-        video_path = temp_dir / file.filename
-        file.save(str(video_path))
-
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            return jsonify({"status": "error", "message": "Cannot open video file"}), 400
-
-        fps            = cap.get(cv2.CAP_PROP_FPS) or 30
-        frame_interval = max(1, int(fps / 5))
-        print(f"[VIDEO] FPS={fps}, processing every {frame_interval} frames")
-
-        frame_count     = 0
-        detected_plates = []
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame is None or frame.size == 0:
-                frame_count += 1
-                continue
-            if frame_count % frame_interval == 0:
-                success, jpg = cv2.imencode(".jpg", frame)
-                if success:
-                    vision = vision_agent_process(jpg.tobytes())
-                    if vision.get("plate"):
-                        detected_plates.append(vision["plate"])
-                        print(f"[VIDEO] Frame {frame_count}: {vision['plate']}")
-            frame_count += 1
+        try:
+            video_path, form = _receive_upload(("interval", "batch_size", "num_workers"))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        try:
+            video, fps = _open_video(video_path)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        frame_interval = form.get("interval", type=int) or int(fps / VIDEO_SAMPLE_FPS)
+        frame_interval = max(1, frame_interval)
+        batch_size     = form.get("batch_size", VIDEO_BATCH_SIZE, type=int)
+        batch_size     = max(1, min(batch_size, VIDEO_MAX_BATCH))
+        num_workers    = form.get("num_workers", 1, type=int)
+        num_workers    = max(1, min(num_workers, os.cpu_count() or 1))
+        print(f"[VIDEO] FPS={fps}, processing every {frame_interval} frames, "
+              f"batch={batch_size}, workers={num_workers}")
+
+        total_frames = _frame_count(video) if num_workers > 1 else 0
+
+        if total_frames > 0:
+            # Each worker opens its own capture; this handle isn't needed
+            if isinstance(video, cv2.VideoCapture):
+                video.release()
+            else:
+                video.close()
+            hits = _detect_plates_parallel(video_path, total_frames, frame_interval,
+                                           batch_size, num_workers)
+            frame_count = total_frames
+        else:
+            # Frames go to the vision agent as arrays — no JPEG encode/decode.
+            # Decoding runs on its own thread while this one runs YOLO batches.
+            meta   = {}
+            frames = _sampled_frames(video, frame_interval, meta)
+            hits   = _detect_plates(_decode_in_background(frames), batch_size)
+            frame_count = meta["total_frames"]
 
-        cap.release()
+        log_plate_detections_bulk((plate, "gate_camera", ts) for _, plate, ts in hits)
+        detected_plates = [plate for _, plate, _ in hits]
 
         if not detected_plates:
             return jsonify({
@@ -352,7 +738,15 @@ def process_video():
             "message": str(e),
             "details": traceback.format_exc(),
         }), 500
+    finally:
+        # Long runs grow the WAL; fold it back once the request is done
+        checkpoint_wal()
 
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000, use_reloader=False)
\ No newline at end of file
+    # One process, one thread per request: the twin cache, its debounced
+    # writer and the loaded models are per-process state, so scale with
+    # threads rather than extra worker processes. Concurrent slot picks are
+    # arbitrated by agentic._occupy_slot, which re-checks and claims the
+    # slot under the twin lock and rejects one that was taken meanwhile.
+    app.run(debug=True, host="0.0.0.0", port=5000, use_reloader=False, threaded=True)
\ No newline at end of file
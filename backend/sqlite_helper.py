@@ -1,31 +1,158 @@
 import sqlite3
 import os
-from datetime import datetime
+import time
+import atexit
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 # Use absolute path for database
 DB_DIR = Path(__file__).parent.parent
 DB_PATH = str(DB_DIR / "parking.db")
 
+# One persistent connection per thread — connect + PRAGMA setup happens once
+# per thread instead of once per helper call.
+_local = threading.local()
+
+# Per-connection settings. journal_mode=WAL is persisted in the database
+# file itself, so init_db sets it once instead of every connection.
+_CONN_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-65536",     # 64 MiB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",   # 256 MB memory-mapped reads
+    "PRAGMA wal_autocheckpoint=2000",  # pages; fewer checkpoints during long video runs
+)
+
+# Row timestamps are stamped by SQLite inside the INSERT/UPDATE, so no Python
+# datetime is built per write. Same naive-UTC ISO-8601 shape as the existing
+# rows (millisecond precision), which datetime.fromisoformat still parses.
+_NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f','now')"
+
+# Writes share a single connection behind a lock so concurrent request
+# threads queue in Python rather than contending for SQLite's write lock.
+# Reads keep using the per-thread connections from get_conn().
+_writer_conn = None
+_write_lock  = threading.Lock()
+
+# Detections are append-only telemetry: they land in an in-memory table
+# attached to the writer connection and a background thread moves them to
+# the on-disk table in one transaction, keeping disk I/O off the hot path.
+# Other processes (the Streamlit frontends) see them after the next flush.
+DETECTION_FLUSH_DELAY = 1.0   # seconds a detection may sit in memory
+_detections_pending   = 0
+_detections_dirty     = threading.Event()
+_detections_flusher   = None
+
+
+def _open_conn():
+    # isolation_level=None: autocommit, so changes are immediately visible
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=10.0, isolation_level=None)
+    for pragma in _CONN_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _open_writer():
+    conn = _open_conn()
+    conn.execute("ATTACH DATABASE ':memory:' AS mem")
+    conn.execute("CREATE TABLE mem.detections (plate TEXT COLLATE NOCASE, source TEXT, detected_at TEXT)")
+    return conn
+
 
 def get_conn():
-    """Get database connection with immediate isolation level for real-time updates"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=10.0)
-    # Use WAL mode for better concurrent access
-    conn.execute("PRAGMA journal_mode=WAL")
-    # Ensure immediate visibility of changes
-    conn.isolation_level = None  # autocommit mode
+    """Get this thread's persistent database connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        try:
+            conn.total_changes  # raises if a caller closed the shared connection
+            return conn
+        except sqlite3.ProgrammingError:
+            pass
+    conn = _open_conn()
+    _local.conn = conn
     return conn
 
 
+@contextmanager
+def _writer():
+    """Yield the shared writer connection while holding the write lock"""
+    global _writer_conn
+    with _write_lock:
+        if _writer_conn is None:
+            _writer_conn = _open_writer()
+        yield _writer_conn
+
+
+def _queue_detections(count):
+    """Note `count` rows buffered in mem.detections (caller holds the write lock)"""
+    global _detections_pending, _detections_flusher
+    _detections_pending += count
+    if _detections_flusher is None:
+        _detections_flusher = threading.Thread(target=_detection_flush_loop, name="detection-flusher", daemon=True)
+        _detections_flusher.start()
+    _detections_dirty.set()
+
+
+def _detection_flush_loop():
+    while True:
+        _detections_dirty.wait()
+        time.sleep(DETECTION_FLUSH_DELAY)
+        _detections_dirty.clear()
+        try:
+            flush_detections()
+        except sqlite3.Error as e:
+            print(f"[SQLITE] ERROR: detection flush failed: {e}")
+            _detections_dirty.set()
+
+
+def flush_detections():
+    """Move buffered detections from memory to the on-disk detections table"""
+    global _detections_pending
+    with _writer() as conn:
+        if not _detections_pending:
+            return
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "INSERT INTO main.detections (plate, source, detected_at) "
+                "SELECT plate, source, detected_at FROM mem.detections ORDER BY rowid"
+            )
+            conn.execute("DELETE FROM mem.detections")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _detections_pending = 0
+
+
+def checkpoint_wal():
+    """Run a passive WAL checkpoint; never blocks readers or writers"""
+    try:
+        get_conn().execute("PRAGMA wal_checkpoint(PASSIVE)")
+    except sqlite3.Error as e:
+        print(f"[SQLITE] WARNING: WAL checkpoint failed: {e}")
+
+
+# The flusher is a daemon thread; don't drop the last buffered rows on exit
+atexit.register(flush_detections)
+
+
 def init_db():
     """Initialize database with all required tables"""
     conn = get_conn()
     cur = conn.cursor()
 
+    # Use WAL mode for better concurrent access (persists in the db file)
+    cur.execute("PRAGMA journal_mode=WAL")
+
+    # Plates compare case-insensitively (COLLATE NOCASE), and the plate
+    # indexes inherit it, so lookups seek the index whatever the input case.
+    # Only applies to newly created databases; existing tables keep BINARY.
     cur.execute("""
     CREATE TABLE IF NOT EXISTS bookings (
-        plate TEXT PRIMARY KEY,
+        plate TEXT PRIMARY KEY COLLATE NOCASE,
         name TEXT,
         model TEXT,
         brand TEXT,
@@ -44,7 +171,7 @@ def init_db():
     cur.execute("""
     CREATE TABLE IF NOT EXISTS entries (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        plate TEXT,
+        plate TEXT COLLATE NOCASE,
         model TEXT,
         size TEXT,
         slot_id INTEGER,
@@ -57,7 +184,7 @@ def init_db():
     cur.execute("""
     CREATE TABLE IF NOT EXISTS detections (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        plate TEXT,
+        plate TEXT COLLATE NOCASE,
         source TEXT,
         detected_at TEXT
     )
@@ -72,144 +199,227 @@ def init_db():
     CREATE INDEX IF NOT EXISTS idx_detections_plate ON detections(plate, detected_at DESC)
     """)
 
-    conn.close()
+    # Dashboard "recent rows" queries: ORDER BY ... DESC LIMIT k walks these
+    # instead of scanning and sorting the whole table. They also carry the
+    # projected columns, so _SQL_RECENT_* are index-only scans.
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_entries_recent ON entries(entered_at DESC, plate, slot_id, price)
+    """)
+
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_detections_recent ON detections(detected_at DESC, plate)
+    """)
+
+    # At most one open (not yet exited) entry per plate. Partial, so it only
+    # holds open rows and doubles as the index for open-entry lookups.
+    try:
+        cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uniq_entries_open ON entries(plate) WHERE exited_at IS NULL
+        """)
+    except sqlite3.IntegrityError:
+        # Legacy data already holds duplicate open entries — keep the lookup
+        # index; mark_entry's NOT EXISTS guard still blocks new duplicates
+        print("[SQLITE] WARNING: duplicate open entries present, uniq_entries_open not created")
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_entries_open ON entries(plate) WHERE exited_at IS NULL
+        """)
+
 
 
 def create_booking(plate, name, brand, model, category, size, entry_time, exit_time, preferences, fuel_type, slot_id=None):
     """Create or update a booking"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT OR REPLACE INTO bookings (plate, name, model, brand, category, size, entry_time, exit_time, preferences, fuel_type, slot_id, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (plate, name, model, brand, category, size, entry_time, exit_time, preferences, fuel_type, slot_id, 'pending', datetime.utcnow().isoformat())
-    )
-    conn.close()
+    with _writer() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO bookings (plate, name, model, brand, category, size, entry_time, exit_time, preferences, fuel_type, slot_id, status, created_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {_NOW_SQL})",
+            (plate, name, model, brand, category, size, entry_time, exit_time, preferences, fuel_type, slot_id, 'pending')
+        )
+
+
+_BOOKING_COLS = (
+    "plate", "name", "model", "brand", "category", "size",
+    "entry_time", "exit_time", "preferences", "fuel_type", "slot_id", "status",
+)
 
 
 def get_booking_by_plate(plate):
     """Get booking information by plate number"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT plate, name, model, brand, category, size, entry_time, exit_time, preferences, fuel_type, slot_id, status FROM bookings WHERE plate=?", (plate,))
-    row = cur.fetchone()
-    conn.close()
+    # Row factory on this cursor only: the other helpers hand plain tuples
+    # to pandas / tuple-unpacking callers
+    cur = get_conn().cursor()
+    cur.row_factory = sqlite3.Row
+    row = cur.execute(
+        "SELECT plate, name, model, brand, category, size, entry_time, exit_time, preferences, fuel_type, slot_id, status FROM bookings WHERE plate=?",
+        (plate,)
+    ).fetchone()
 
     if not row:
         return None
 
-    return {
-        "plate": row[0],
-        "name": row[1],
-        "model": row[2],
-        "brand": row[3],
-        "category": row[4],
-        "size": row[5],
-        "entry_time": row[6],
-        "exit_time": row[7],
-        "preferences": row[8],
-        "fuel_type": row[9],
-        "slot_id": row[10],
-        "status": row[11]
-    }
+    return dict(row)
+
+
+def get_plate_status(plate):
+    """
+    Booking, open entry and detection count for a plate in one query.
+    Returns {"booking": dict|None, "entry": dict|None, "detections": int}.
+    """
+    row = get_conn().execute(
+        """
+        SELECT b.plate, b.name, b.model, b.brand, b.category, b.size,
+               b.entry_time, b.exit_time, b.preferences, b.fuel_type, b.slot_id, b.status,
+               e.slot_id, e.price, e.entered_at,
+               (SELECT COUNT(*) FROM detections WHERE plate = :plate)
+        FROM (SELECT :plate AS plate) q
+        LEFT JOIN bookings b ON b.plate = q.plate
+        LEFT JOIN (
+            SELECT plate, slot_id, price, entered_at FROM entries
+            WHERE plate = :plate AND exited_at IS NULL
+            ORDER BY entered_at DESC LIMIT 1
+        ) e ON e.plate = q.plate
+        """,
+        {"plate": plate}
+    ).fetchone()
+
+    booking = dict(zip(_BOOKING_COLS, row[:12])) if row[0] is not None else None
+    entry   = {"slot_id": row[12], "price": row[13], "entered_at": row[14]} if row[14] is not None else None
+    return {"booking": booking, "entry": entry, "detections": row[15]}
 
 
 def log_plate_detection(plate, source="gate_camera"):
-    """Log a plate detection event"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO detections (plate, source, detected_at) VALUES (?, ?, ?)",
-        (plate, source, datetime.utcnow().isoformat())
-    )
-    conn.close()
+    """Log a plate detection event (buffered, see flush_detections)"""
+    with _writer() as conn:
+        conn.execute(
+            f"INSERT INTO mem.detections (plate, source, detected_at) VALUES (?, ?, {_NOW_SQL})",
+            (plate, source)
+        )
+        _queue_detections(1)
+
+
+def log_plate_detections_bulk(rows):
+    """
+    Log many detection events in one transaction (buffered, see flush_detections).
+    rows: iterable of (plate, source, detected_at) tuples.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    with _writer() as conn:
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO mem.detections (plate, source, detected_at) VALUES (?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _queue_detections(len(rows))
 
 
 def mark_booking_assigned(plate, slot_id):
     """Assign a slot to a booking and mark as entered"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE bookings SET slot_id = ?, status = ? WHERE plate = ?",
-        (slot_id, 'entered', plate)
-    )
-    conn.close()
+    with _writer() as conn:
+        conn.execute(
+            "UPDATE bookings SET slot_id = ?, status = ? WHERE plate = ?",
+            (slot_id, 'entered', plate)
+        )
+
+
+def set_booking_slot(plate, slot_id):
+    """Record the slot pre-allocated to a booking, leaving its status alone"""
+    with _writer() as conn:
+        conn.execute(
+            "UPDATE bookings SET slot_id = ? WHERE plate = ?",
+            (slot_id, plate)
+        )
 
 
 def mark_entry(plate, model, size, slot_id, price):
     """Record a vehicle entry"""
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    # Check if entry already exists for this plate (avoid duplicates)
-    cur.execute(
-        "SELECT id FROM entries WHERE plate = ? AND exited_at IS NULL",
-        (plate,)
-    )
-    existing = cur.fetchone()
-    
-    if existing:
+    # Duplicate check and insert are one statement: NOT EXISTS probes the
+    # partial open-entry index, OR IGNORE defers to uniq_entries_open
+    with _writer() as conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO entries (plate, model, size, slot_id, price, entered_at) "
+            f"SELECT ?, ?, ?, ?, ?, {_NOW_SQL} "
+            "WHERE NOT EXISTS (SELECT 1 FROM entries WHERE plate = ? AND exited_at IS NULL)",
+            (plate, model, size, slot_id, price, plate)
+        )
+
+    if cur.rowcount == 0:
         print(f"[SQLITE] Entry already exists for plate {plate}, skipping duplicate")
-        conn.close()
         return
-    
-    cur.execute(
-        "INSERT INTO entries (plate, model, size, slot_id, price, entered_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (plate, model, size, slot_id, price, datetime.utcnow().isoformat())
-    )
     print(f"[SQLITE] Entry recorded: {plate} -> Slot {slot_id} @ ₹{price}")
-    conn.close()
 
 
 def mark_exit(plate):
     """Record a vehicle exit"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE entries SET exited_at = ? WHERE plate = ? AND exited_at IS NULL",
-        (datetime.utcnow().isoformat(), plate)
-    )
-    # Also update booking status
-    cur.execute(
-        "UPDATE bookings SET status = ? WHERE plate = ?",
-        ('exited', plate)
-    )
-    conn.close()
+    with _writer() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"UPDATE entries SET exited_at = {_NOW_SQL} WHERE plate = ? AND exited_at IS NULL",
+            (plate,)
+        )
+        # Also update booking status
+        cur.execute(
+            "UPDATE bookings SET status = ? WHERE plate = ?",
+            ('exited', plate)
+        )
+
+
+_SQL_OCCUPANCY = "SELECT COUNT(*) FROM entries WHERE exited_at IS NULL"
 
 
 def get_occupancy_counts():
     """Get current occupancy count (entries without exits)"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM entries WHERE exited_at IS NULL")
-    count = cur.fetchone()[0]
-    conn.close()
-    return {"entries": count}
+    return {"entries": get_conn().execute(_SQL_OCCUPANCY).fetchone()[0]}
+
+
+# Dashboard queries, kept byte-identical so each connection's statement
+# cache reuses the prepared statement across reruns
+_SQL_RECENT_DETECTIONS = "SELECT plate, detected_at FROM detections ORDER BY detected_at DESC LIMIT ?"
+_SQL_RECENT_ENTRIES    = "SELECT plate, slot_id, price, entered_at FROM entries ORDER BY entered_at DESC LIMIT ?"
 
 
 def get_recent_detections(limit=10):
     """Get recent plate detections"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT plate, detected_at FROM detections ORDER BY detected_at DESC LIMIT ?",
-        (limit,)
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    return get_conn().execute(_SQL_RECENT_DETECTIONS, (limit,)).fetchall()
 
 
 def get_recent_entries(limit=10):
     """Get recent entries"""
+    return get_conn().execute(_SQL_RECENT_ENTRIES, (limit,)).fetchall()
+
+
+def dashboard_snapshot(limit=20):
+    """
+    Occupancy count plus the `limit` most recent detections and entries,
+    read in one transaction so all dashboard panels show the same instant.
+    """
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT plate, slot_id, price, entered_at FROM entries ORDER BY entered_at DESC LIMIT ?",
-        (limit,)
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    conn.execute("BEGIN DEFERRED")
+    try:
+        occupied   = conn.execute(_SQL_OCCUPANCY).fetchone()[0]
+        detections = conn.execute(_SQL_RECENT_DETECTIONS, (limit,)).fetchall()
+        recent     = conn.execute(_SQL_RECENT_ENTRIES, (limit,)).fetchall()
+    finally:
+        conn.execute("COMMIT")
+    return {
+        "occupancy":  {"entries": occupied},
+        "detections": detections,
+        "entries":    recent,
+    }
+
+def get_open_entries_signature():
+    """
+    (MAX(id), COUNT(*)) of entries not yet exited; changes whenever a
+    vehicle enters or exits, so dashboards can key caches on it.
+    """
+    return tuple(get_conn().execute(
+        "SELECT MAX(id), COUNT(*) FROM entries WHERE exited_at IS NULL"
+    ).fetchone())
 
 def get_all_entries():
     """Get all entries for detailed logging"""
@@ -219,7 +429,6 @@ def get_all_entries():
         "SELECT plate, model, size, slot_id, price, entered_at, exited_at FROM entries ORDER BY entered_at DESC"
     )
     rows = cur.fetchall()
-    conn.close()
     return rows
 
 
@@ -233,7 +442,6 @@ def get_entry_by_plate(plate):
         (plate,)
     )
     row = cur.fetchone()
-    conn.close()
     
     if not row:
         return None
@@ -257,7 +465,6 @@ def get_active_entries_with_details():
         WHERE e.exited_at IS NULL
     ''')
     rows = cur.fetchall()
-    conn.close()
     
     mapping = {}
     for r in rows:
@@ -88,6 +88,7 @@ REPORTS_DIR.mkdir(exist_ok=True)
 # ---------------------------------------------------------------------------
 def reset_twin_for_benchmark():
     """Reset all slots to 'free' for a clean benchmark run."""
+    ag.flush_twin()   # land any debounced agent write before overwriting the file
     dt = json.load(open(DT_PATH))
     for s in dt["slots"]:
         s["status"] = "free"
@@ -528,7 +529,8 @@ def main():
         results_path = RESULTS_DIR / f"{model['slug']}_results.json"
         print(f"\n  Raw results -> {results_path}")
 
-        # Compute all metrics
+        # Compute all metrics (PSR reads the twin file, so land pending writes)
+        ag.flush_twin()
         prices = [r["price"] for r in results if r.get("price") and r["actual_status"] == "entered"]
         metrics = {
             "tsr":        compute_tsr(results),
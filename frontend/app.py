@@ -10,20 +10,26 @@ from datetime import datetime
 import time
 import pytz
 
+# Optional: orjson parses the twin straight from bytes; stdlib json otherwise
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Resolve backend package
 THIS_DIR = Path(__file__).resolve().parent
 ROOT_DIR = THIS_DIR.parent
-sys.path.append(str(ROOT_DIR))
+if str(ROOT_DIR) not in sys.path:   # Streamlit reruns re-execute this file
+    sys.path.insert(0, str(ROOT_DIR))
 
 from backend.sqlite_helper import (
     create_booking,
     get_booking_by_plate,
-    get_recent_entries,
-    get_recent_detections,
-    get_entry_by_plate,
+    dashboard_snapshot,
     get_occupancy_counts,
     get_all_entries,
-    get_conn,
+    get_plate_status,
 )
 
 TWIN_PATH = ROOT_DIR / "backend" / "mock_digital_twin.json"
@@ -39,24 +45,48 @@ route = st.sidebar.radio("Select View:", ["Customer Portal", "Control Center"])
 st.sidebar.markdown("---")
 
 # Shared Helpers
+IST       = pytz.timezone("Asia/Kolkata")
+TS_FORMAT = "%Y-%m-%d %I:%M:%S %p"
+
+
 def format_timestamp_local(iso_timestamp: str) -> str:
     try:
         dt = datetime.fromisoformat(iso_timestamp)
-        tz = pytz.timezone("Asia/Kolkata")
         if dt.tzinfo is None:
-            dt_local = dt.replace(tzinfo=pytz.UTC).astimezone(tz)
+            dt_local = dt.replace(tzinfo=pytz.UTC).astimezone(IST)
         else:
-            dt_local = dt.astimezone(tz)
-        return dt_local.strftime("%Y-%m-%d %I:%M:%S %p")
-    except Exception:
+            dt_local = dt.astimezone(IST)
+        return dt_local.strftime(TS_FORMAT)
+    except (ValueError, TypeError):   # unparsable or missing: show the raw value
         return iso_timestamp
 
-def format_timestamp(iso_timestamp: str) -> str:
-    try:
-        dt = datetime.fromisoformat(iso_timestamp)
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
-    except Exception:
-        return iso_timestamp
+
+def format_timestamps_local(col: pd.Series) -> pd.Series:
+    """Vectorised format_timestamp_local; naive values are taken as UTC."""
+    parsed = pd.to_datetime(col, errors="coerce", format="ISO8601", utc=True)
+    local  = parsed.dt.tz_convert(IST).dt.strftime(TS_FORMAT)
+    return local.fillna(col)   # unparsable values pass through, as above
+
+def format_timestamps(col: pd.Series) -> pd.Series:
+    """Format a column of ISO timestamps as-is (no tz shift) in one vectorised pass."""
+    parsed = pd.to_datetime(col, errors="coerce", format="ISO8601")
+    return parsed.dt.strftime("%Y-%m-%d %H:%M:%S").fillna(col)
+
+# Control Center slot cards: styling per status and the markup filled per slot
+SLOT_STYLES = {
+    "free":     {"color": "#28a745", "bg": "#d4edda", "text": "#155724"},
+    "occupied": {"color": "#dc3545", "bg": "#f8d7da", "text": "#721c24"},
+    "reserved": {"color": "#ffc107", "bg": "#fff3cd", "text": "#856404"},
+}
+UNKNOWN_SLOT_STYLE = {"color": "#6c757d", "bg": "#e2e3e5", "text": "#383d41"}
+
+SLOT_CARD_TEMPLATE = (
+    '<div style="border: 1px solid {color}; border-top: 4px solid {color}; background-color: {bg}; color: {text}; padding: 10px; border-radius: 4px; margin-bottom: 10px; text-align: center; font-family: sans-serif;">'
+    '<div style="font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">Slot {slot_id}</div>'
+    '<div style="font-size: 0.9em; text-transform: uppercase;">{status}</div>'
+    '<div style="font-size: 0.8em; margin-top: 5px;">Dist: {distance}m</div>'
+    '</div>'
+)
 
 def check_system_status():
     try:
@@ -65,30 +95,13 @@ def check_system_status():
     except Exception:
         return "Offline", "#6c757d"
 
-def count_detections_for_plate(plate: str) -> int:
-    conn = get_conn()
-    cur  = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM detections WHERE plate=?", (plate,))
-    count = cur.fetchone()[0]
-    conn.close()
-    return count
-
 if route == "Customer Portal":
     st.title("🚗 Smart Parking — Customer Portal")
 
-    if "last_refresh" not in st.session_state:
-        st.session_state.last_refresh = time.time()
-
-    auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh Entry Status", value=False)
-    if auto_refresh:
-        refresh_interval = st.sidebar.slider("Refresh interval (seconds)", 3, 30, 5)
-        time.sleep(refresh_interval)
-        st.session_state.last_refresh = time.time()
-        st.rerun()
-
-    st.sidebar.caption(
-        f"Last updated: {time.strftime('%H:%M:%S', time.localtime(st.session_state.last_refresh))}"
-    )
+    # Only the Entry Dashboard fragment reruns on this interval; the rest of
+    # the page (forms, other tabs) is not re-executed.
+    auto_refresh     = st.sidebar.checkbox("🔄 Auto-refresh Entry Status", value=False)
+    refresh_interval = st.sidebar.slider("Refresh interval (seconds)", 3, 30, 5) if auto_refresh else None
 
     tab1, tab2, tab3, tab4 = st.tabs(["📋 Pre-Booking", "🔍 Check Status", "📊 Entry Dashboard", "🛂 Gate Simulation"])
 
@@ -253,7 +266,9 @@ if route == "Customer Portal":
         with col_result:
             if search_btn and lookup_plate:
                 try:
-                    booking = get_booking_by_plate(lookup_plate)
+                    # Booking, open entry and detection count in one query
+                    plate_status = get_plate_status(lookup_plate)
+                    booking      = plate_status["booking"]
                     if booking:
                         st.success(f"✅ Booking found for **{lookup_plate}**")
                         col_a, col_b, col_c = st.columns(3)
@@ -265,7 +280,7 @@ if route == "Customer Portal":
                             else:
                                 st.metric("Status", "⏳ Pending", delta="Awaiting")
 
-                        entry = get_entry_by_plate(lookup_plate)
+                        entry = plate_status["entry"]
                         if entry:
                             st.success("🎉 **Vehicle has entered parking!**")
                             st.write(f"- **Slot:** {entry['slot_id']}")
@@ -273,7 +288,7 @@ if route == "Customer Portal":
                             st.write(f"- **Entry Time:** {format_timestamp_local(entry['entered_at'])}")
                         else:
                             st.info("⏳ Vehicle not yet entered. Proceed to gate.")
-                            detection_count = count_detections_for_plate(lookup_plate)
+                            detection_count = plate_status["detections"]
                             if detection_count > 0:
                                 st.warning(f"📸 Your plate has been detected {detection_count} time(s) — entry is processing…")
                     else:
@@ -284,20 +299,30 @@ if route == "Customer Portal":
                 st.warning("Please enter a licence plate number.")
 
     # ══ TAB 3: ENTRY DASHBOARD ═══════════════════════════════════════════════════
-    with tab3:
+    @st.fragment(run_every=refresh_interval)
+    def entry_dashboard():
         st.header("📊 Recent Entry Activity")
         col_refresh = st.columns([4, 1])
         with col_refresh[1]:
-            if st.button("🔄 Refresh", use_container_width=True):
-                st.session_state.last_refresh = time.time()
-                st.rerun()
+            # Clicking reruns just this fragment
+            st.button("🔄 Refresh", use_container_width=True)
+        with col_refresh[0]:
+            st.caption(f"Last updated: {time.strftime('%H:%M:%S')}")
+
+        # Both panels come from one read transaction, so they always agree
+        try:
+            snapshot = dashboard_snapshot(limit=15)
+        except Exception as e:
+            st.error(f"Error loading dashboard: {e}")
+            snapshot = None
 
         st.subheader("✅ Recent Entries")
         try:
-            entries = get_recent_entries(limit=15)
+            entries = snapshot["entries"] if snapshot else []
             if entries:
-                formatted = [[plate, slot_id, f"₹{price:.2f}", format_timestamp_local(entered_at)] for plate, slot_id, price, entered_at in entries]
-                df = pd.DataFrame(formatted, columns=["Plate", "Slot ID", "Price (₹)", "Entered At"])
+                df = pd.DataFrame(entries, columns=["Plate", "Slot ID", "Price (₹)", "Entered At"])
+                df["Price (₹)"]  = df["Price (₹)"].map("₹{:.2f}".format)
+                df["Entered At"] = format_timestamps_local(df["Entered At"])
                 most_recent = df.iloc[0]
                 st.info(f"🎉 **Latest Arrival:** Vehicle **{most_recent['Plate']}** parked in Slot **{most_recent['Slot ID']}**.")
                 st.dataframe(df, use_container_width=True, height=350, hide_index=True)
@@ -309,16 +334,19 @@ if route == "Customer Portal":
         st.divider()
         st.subheader("🎥 Recent Plate Detections")
         try:
-            detections = get_recent_detections(limit=10)
+            detections = snapshot["detections"][:10] if snapshot else []
             if detections:
-                formatted_det = [[plate, format_timestamp_local(detected_at)] for plate, detected_at in detections]
-                df_det = pd.DataFrame(formatted_det, columns=["Plate", "Detected At"])
+                df_det = pd.DataFrame(detections, columns=["Plate", "Detected At"])
+                df_det["Detected At"] = format_timestamps_local(df_det["Detected At"])
                 st.dataframe(df_det, use_container_width=True, height=250, hide_index=True)
             else:
                 st.info("No detections yet.")
         except Exception as e:
             st.error(f"Error loading detections: {e}")
 
+    with tab3:
+        entry_dashboard()
+
     # ══ TAB 4: GATE SIMULATION ═══════════════════════════════════════════════════
     with tab4:
         st.header("🛂 Simulate Gate Entry")
@@ -374,10 +402,9 @@ elif route == "Control Center":
     alerts = []
     try:
         if TWIN_PATH.exists():
-            with open(TWIN_PATH) as f:
-                twin_data = json.load(f)
-                if "slots" in twin_data: twin["slots"] = twin_data["slots"]
-                else: alerts.append("Invalid JSON: 'slots' key missing in digital twin.")
+            twin_data = _json_loads(TWIN_PATH.read_bytes())
+            if "slots" in twin_data: twin["slots"] = twin_data["slots"]
+            else: alerts.append("Invalid JSON: 'slots' key missing in digital twin.")
         else: alerts.append("File Error: Digital twin JSON not found.")
     except json.JSONDecodeError: alerts.append("JSON Error: Failed to parse digital twin data.")
     except Exception as e: alerts.append(f"System Error: {str(e)}")
@@ -419,25 +446,19 @@ elif route == "Control Center":
             for size_label, slots in slots_by_size.items():
                 if not slots: continue
                 st.markdown(f"**Size: {size_label.title()}**")
-                cols = st.columns(min(len(slots), 6))
-                for idx, slot in enumerate(slots):
-                    with cols[idx % len(cols)]:
-                        status = slot.get("status", "unknown")
-                        if status == "free": color, bg, text = "#28a745", "#d4edda", "#155724"
-                        elif status == "occupied": color, bg, text = "#dc3545", "#f8d7da", "#721c24"
-                        elif status == "reserved": color, bg, text = "#ffc107", "#fff3cd", "#856404"
-                        else: color, bg, text = "#6c757d", "#e2e3e5", "#383d41"
-
-                        slot_id = slot.get('id', 'N/A')
-                        distance = slot.get('distance', 'N/A')
-                        
-                        st.markdown(f'''
-                        <div style="border: 1px solid {color}; border-top: 4px solid {color}; background-color: {bg}; color: {text}; padding: 10px; border-radius: 4px; margin-bottom: 10px; text-align: center; font-family: sans-serif;">
-                            <div style="font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">Slot {slot_id}</div>
-                            <div style="font-size: 0.9em; text-transform: uppercase;">{status}</div>
-                            <div style="font-size: 0.8em; margin-top: 5px;">Dist: {distance}m</div>
-                        </div>
-                        ''', unsafe_allow_html=True)
+                # One markdown call per size group instead of one per slot
+                cards = "".join(
+                    SLOT_CARD_TEMPLATE.format(
+                        slot_id=slot.get('id', 'N/A'), status=slot.get("status", "unknown"),
+                        distance=slot.get('distance', 'N/A'),
+                        **SLOT_STYLES.get(slot.get("status"), UNKNOWN_SLOT_STYLE),
+                    )
+                    for slot in slots
+                )
+                st.markdown(
+                    f'<div style="display: grid; grid-template-columns: repeat({min(len(slots), 6)}, 1fr); column-gap: 1rem;">{cards}</div>',
+                    unsafe_allow_html=True,
+                )
 
     with tab_gate:
         col_upload, col_model = st.columns([1, 1])
@@ -499,12 +520,14 @@ elif route == "Control Center":
         try:
             all_entries = get_all_entries()
             if all_entries:
-                formatted_entries = []
-                for e in all_entries:
-                    plate, model, size, slot_id, price, entered_at, exited_at = e
-                    status = "Active" if not exited_at else "Exited"
-                    formatted_entries.append({"Timestamp": format_timestamp(entered_at), "Event Type": "Entry", "Plate": plate, "Slot": str(slot_id) if slot_id else "N/A", "Status": status})
-                df_entries = pd.DataFrame(formatted_entries)
+                df = pd.DataFrame(all_entries, dtype=object, columns=["Plate", "Model", "Size", "Slot", "Price", "Entered At", "Exited At"])
+                df_entries = pd.DataFrame({
+                    "Timestamp": format_timestamps(df["Entered At"]),
+                    "Event Type": "Entry",
+                    "Plate": df["Plate"],
+                    "Slot": df["Slot"].where(df["Slot"].astype(bool), "N/A").astype(str),
+                    "Status": df["Exited At"].astype(bool).map({False: "Active", True: "Exited"}),
+                })
                 st.dataframe(df_entries, use_container_width=True, hide_index=True)
                 csv = df_entries.to_csv(index=False).encode('utf-8')
                 st.download_button("Download CSV", data=csv, file_name="logs.csv", mime="text/csv")
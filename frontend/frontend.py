@@ -11,15 +11,15 @@ from datetime import datetime
 import pytz
 
 # Resolve backend package regardless of launch directory
-sys.path.append(str(Path(__file__).parent.parent))
+_ROOT = str(Path(__file__).parent.parent)
+if _ROOT not in sys.path:   # Streamlit reruns re-execute this file
+    sys.path.insert(0, _ROOT)
 
 from backend.sqlite_helper import (
     create_booking,
     get_booking_by_plate,
-    get_recent_entries,
-    get_recent_detections,
-    get_entry_by_plate,
-    get_conn,           # FIX: imported at top, not inside a conditional block
+    dashboard_snapshot,
+    get_plate_status,
 )
 
 FLASK_BASE = "http://localhost:5000"
@@ -32,42 +32,48 @@ st.set_page_config(
 st.title("🚗 Smart Parking — Customer Portal")
 
 # ── sidebar auto-refresh ──────────────────────────────────────────────────────
-if "last_refresh" not in st.session_state:
-    st.session_state.last_refresh = time.time()
-
-auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh Entry Status", value=False)
-if auto_refresh:
-    refresh_interval = st.sidebar.slider("Refresh interval (seconds)", 3, 30, 5)
-    time.sleep(refresh_interval)
-    st.session_state.last_refresh = time.time()
-    st.rerun()
-
-st.sidebar.caption(
-    f"Last updated: {time.strftime('%H:%M:%S', time.localtime(st.session_state.last_refresh))}"
-)
+# Only the Entry Dashboard fragment reruns on this interval; the rest of the
+# script (imports, forms, other tabs) is not re-executed.
+auto_refresh     = st.sidebar.checkbox("🔄 Auto-refresh Entry Status", value=False)
+refresh_interval = st.sidebar.slider("Refresh interval (seconds)", 3, 30, 5) if auto_refresh else None
 
 
 # ── helpers ───────────────────────────────────────────────────────────────────
 
+IST       = pytz.timezone("Asia/Kolkata")
+TS_FORMAT = "%Y-%m-%d %I:%M:%S %p"
+
+
 def format_timestamp(iso_timestamp: str) -> str:
     try:
         dt = datetime.fromisoformat(iso_timestamp)
-        tz = pytz.timezone("Asia/Kolkata")
-        dt_local = dt.replace(tzinfo=pytz.UTC).astimezone(tz)
-        return dt_local.strftime("%Y-%m-%d %I:%M:%S %p")
-    except Exception:
+        dt_local = dt.replace(tzinfo=pytz.UTC).astimezone(IST)
+        return dt_local.strftime(TS_FORMAT)
+    except (ValueError, TypeError):   # unparsable or missing: show the raw value
         return iso_timestamp
 
 
-def count_detections_for_plate(plate: str) -> int:
-    """Count how many times a plate has been seen by the gate camera."""
-    # FIX: get_conn is now imported at the top of the file — no mid-handler import
-    conn = get_conn()
-    cur  = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM detections WHERE plate=?", (plate,))
-    count = cur.fetchone()[0]
-    conn.close()
-    return count
+def format_timestamps(col: pd.Series) -> pd.Series:
+    """Vectorised format_timestamp for a column of (naive UTC) ISO strings."""
+    parsed = pd.to_datetime(col, errors="coerce", format="ISO8601", utc=True)
+    local  = parsed.dt.tz_convert(IST).dt.strftime(TS_FORMAT)
+    return local.fillna(col)   # unparsable values pass through, as above
+
+
+# Dashboard reads are cached for the shortest refresh interval, so reruns
+# within one window (widget clicks, auto-refresh) share a single query.
+# The Refresh button and new bookings clear them.
+DB_CACHE_TTL = 3   # seconds
+
+
+@st.cache_data(ttl=DB_CACHE_TTL, show_spinner=False)
+def cached_dashboard_snapshot(limit: int) -> dict:
+    return dashboard_snapshot(limit=limit)
+
+
+@st.cache_data(ttl=DB_CACHE_TTL, show_spinner=False)
+def cached_plate_status(plate: str) -> dict:
+    return get_plate_status(plate)
 
 
 # ── tabs ──────────────────────────────────────────────────────────────────────
@@ -206,6 +212,7 @@ with tab1:
                     Drive to the gate — the system will handle the rest!
                     """)
                     time.sleep(4)
+                    st.cache_data.clear()
                     st.rerun()
 
             except Exception as e:
@@ -259,7 +266,9 @@ with tab2:
     with col_result:
         if search_btn and lookup_plate:
             try:
-                booking = get_booking_by_plate(lookup_plate)
+                # Booking, open entry and detection count in one query
+                plate_status = cached_plate_status(lookup_plate)
+                booking      = plate_status["booking"]
 
                 if booking:
                     st.success(f"✅ Booking found for **{lookup_plate}**")
@@ -276,7 +285,7 @@ with tab2:
                         else:
                             st.metric("Status", "⏳ Pending", delta="Awaiting")
 
-                    entry = get_entry_by_plate(lookup_plate)
+                    entry = plate_status["entry"]
 
                     if entry:
                         st.success("🎉 **Vehicle has entered parking!**")
@@ -299,8 +308,7 @@ with tab2:
                     else:
                         st.info("⏳ Vehicle not yet entered. Proceed to gate.")
 
-                        # FIX: use the imported get_conn helper — no runtime import
-                        detection_count = count_detections_for_plate(lookup_plate)
+                        detection_count = plate_status["detections"]
                         if detection_count > 0:
                             st.warning(
                                 f"📸 Your plate has been detected {detection_count} "
@@ -325,25 +333,33 @@ with tab2:
 
 
 # ══ TAB 3: ENTRY DASHBOARD ═══════════════════════════════════════════════════
-with tab3:
+@st.fragment(run_every=refresh_interval)
+def entry_dashboard():
     st.header("📊 Recent Entry Activity")
 
     col_refresh = st.columns([4, 1])
     with col_refresh[1]:
+        # Clicking reruns just this fragment; drop cached reads before it renders
         if st.button("🔄 Refresh", use_container_width=True):
-            st.session_state.last_refresh = time.time()
-            st.rerun()
+            st.cache_data.clear()
+    with col_refresh[0]:
+        st.caption(f"Last updated: {time.strftime('%H:%M:%S')}")
+
+    # Both panels come from one read transaction, so they always agree
+    try:
+        snapshot = cached_dashboard_snapshot(15)
+    except Exception as e:
+        st.error(f"Error loading dashboard: {e}")
+        snapshot = None
 
     st.subheader("✅ Recent Entries")
     try:
-        entries = get_recent_entries(limit=15)
+        entries = snapshot["entries"] if snapshot else []
         if entries:
-            formatted = [
-                [plate, slot_id, f"₹{price:.2f}", format_timestamp(entered_at)]
-                for plate, slot_id, price, entered_at in entries
-            ]
-            df = pd.DataFrame(formatted, columns=["Plate", "Slot ID", "Price (₹)", "Entered At"])
-            
+            df = pd.DataFrame(entries, columns=["Plate", "Slot ID", "Price (₹)", "Entered At"])
+            df["Price (₹)"]  = df["Price (₹)"].map("₹{:.2f}".format)
+            df["Entered At"] = format_timestamps(df["Entered At"])
+
             # Show a detailed metric for the most recent entry
             most_recent = df.iloc[0]
             st.info(f"🎉 **Latest Arrival:** Vehicle **{most_recent['Plate']}** parked in Slot **{most_recent['Slot ID']}**.")
@@ -358,13 +374,10 @@ with tab3:
 
     st.subheader("🎥 Recent Plate Detections")
     try:
-        detections = get_recent_detections(limit=10)
+        detections = snapshot["detections"][:10] if snapshot else []
         if detections:
-            formatted_det = [
-                [plate, format_timestamp(detected_at)]
-                for plate, detected_at in detections
-            ]
-            df_det = pd.DataFrame(formatted_det, columns=["Plate", "Detected At"])
+            df_det = pd.DataFrame(detections, columns=["Plate", "Detected At"])
+            df_det["Detected At"] = format_timestamps(df_det["Detected At"])
             st.dataframe(df_det, use_container_width=True, height=250, hide_index=True)
         else:
             st.info("No detections yet.")
@@ -372,6 +385,10 @@ with tab3:
         st.error(f"Error loading detections: {e}")
 
 
+with tab3:
+    entry_dashboard()
+
+
 # ══ TAB 4: GATE SIMULATION ═══════════════════════════════════════════════════
 with tab4:
     st.header("🛂 Simulate Gate Entry")
@@ -5,15 +5,23 @@ Run:  streamlit run frontend/security_gate.py
 import streamlit as st
 import sys, requests, json
 from pathlib import Path
-import pandas as pd
-from datetime import datetime
 import time
+from collections import Counter
+
+# Optional: orjson parses the twin straight from bytes; stdlib json otherwise
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 THIS_DIR  = Path(__file__).resolve().parent
 ROOT_DIR  = THIS_DIR.parent
-sys.path.append(str(ROOT_DIR))
+# Streamlit re-executes this file on every rerun; add the path only once
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
 
-from backend.sqlite_helper import get_recent_detections, get_recent_entries, get_occupancy_counts, get_all_entries
+from backend.sqlite_helper import get_recent_detections, get_recent_entries, get_occupancy_counts, get_all_entries, get_open_entries_signature
 
 TWIN_PATH = ROOT_DIR / "backend" / "mock_digital_twin.json"
 FLASK_BASE = "http://localhost:5000"
@@ -26,12 +34,16 @@ st.set_page_config(
 st.title("Smart Parking Control Center")
 st.markdown("---")
 
-def format_timestamp(iso_timestamp: str) -> str:
-    try:
-        dt = datetime.fromisoformat(iso_timestamp)
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
-    except Exception:
-        return iso_timestamp
+def format_timestamps(col: "pd.Series") -> "pd.Series":
+    """Format a column of ISO timestamps in one vectorised pass; unparsable values pass through"""
+    import pandas as pd
+    parsed = pd.to_datetime(col, errors="coerce", format="ISO8601")
+    return parsed.dt.strftime("%Y-%m-%d %H:%M:%S").fillna(col)
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_twin(mtime_ns: int) -> dict:
+    """Parsed digital twin; keyed on the file's mtime so reruns skip the read"""
+    return _json_loads(TWIN_PATH.read_bytes())
 
 def get_active_entries_with_details():
     """Get active entries joined with booking details if available"""
@@ -65,6 +77,83 @@ def get_active_entries_with_details():
         }
     return mapping
 
+# Slot card styling per status, and the card markup filled in per slot
+SLOT_STYLES = {
+    "free":     {"color": "#28a745", "bg": "#d4edda", "text": "#155724"},
+    "occupied": {"color": "#dc3545", "bg": "#f8d7da", "text": "#721c24"},
+    "reserved": {"color": "#ffc107", "bg": "#fff3cd", "text": "#856404"},
+}
+UNKNOWN_SLOT_STYLE = {"color": "#6c757d", "bg": "#e2e3e5", "text": "#383d41"}
+
+SLOT_CARD_TEMPLATE = (
+    '<div style="border: 1px solid {color}; border-top: 4px solid {color}; background-color: {bg}; color: {text}; padding: 8px; border-radius: 4px; margin-bottom: 10px; text-align: center; font-family: sans-serif; height: 100%;">'
+    '<div style="font-weight: bold; font-size: 1.0em; margin-bottom: 2px;">Slot {slot_id}</div>'
+    '<div style="font-size: 0.85em; text-transform: uppercase;">{status}</div>'
+    '<div style="font-size: 0.8em; margin-top: 2px; opacity: 0.8;">Size: {size}</div>'
+    '{vehicle_info}'
+    '</div>'
+)
+VEHICLE_INFO_TEMPLATE = '<div style="font-size: 0.75em; margin-top: 6px; border-top: 1px solid {color}; padding-top: 4px;">{info}</div>'
+
+def slot_card_html(slot: dict, active_entries: dict) -> str:
+    """HTML for one slot card; occupied slots show the parked vehicle if known"""
+    status = slot.get("status", "unknown")
+    style = SLOT_STYLES.get(status, UNKNOWN_SLOT_STYLE)
+    slot_id = slot.get('id', 'N/A')
+
+    # Extra info if occupied
+    vehicle_info = ""
+    if status == "occupied":
+        v_info = active_entries.get(slot_id)
+        if v_info:
+            info = f"<b>{v_info.get('plate', 'N/A')}</b><br/>{v_info.get('model', 'N/A')}<br/>({v_info.get('category', 'N/A')})"
+        else:
+            info = "<i>Vehicle Info N/A</i>"
+        vehicle_info = VEHICLE_INFO_TEMPLATE.format(color=style["color"], info=info)
+
+    return SLOT_CARD_TEMPLATE.format(
+        slot_id=slot_id, status=status, size=slot.get('size', 'N/A').title(),
+        vehicle_info=vehicle_info, **style,
+    )
+
+def build_slot_view(slots: list, key: tuple) -> dict:
+    """
+    Status counts and per-zone (label, features caption, grid HTML) for the
+    slot list, tagged with the (twin mtime, open-entries signature) key they
+    were built from.
+    """
+    # One pass over the slots for every status count
+    counts = Counter(s.get("status") for s in slots)
+
+    # Get active entries mapping (for occupied-slot vehicle info)
+    active_entries = get_active_entries_with_details() if counts["occupied"] else {}
+
+    # Group by zone
+    slots_by_zone = {}
+    for slot in slots:
+        slots_by_zone.setdefault(slot.get("zone", "Unknown Zone"), []).append(slot)
+
+    zones = []
+    for zone_label, zone_slots in sorted(slots_by_zone.items()):
+        # Extract common features for the zone (optional, based on mock_digital_twin structure)
+        zone_features = set()
+        for s in zone_slots:
+            if "features" in s:
+                zone_features.update(s["features"])
+        features_caption = f"**Features:** {', '.join(zone_features) if zone_features else 'Standard'}"
+
+        # One markdown call per zone instead of one per slot
+        grid_html = (
+            f'<div style="display: grid; grid-template-columns: repeat({min(len(zone_slots), 8)}, 1fr); column-gap: 1rem;">'
+            + "".join(slot_card_html(slot, active_entries) for slot in zone_slots)
+            + '</div>'
+        )
+        zones.append((zone_label, features_caption, grid_html))
+
+    return {"key": key, "counts": counts, "total": len(slots), "zones": zones}
+
+EMPTY_SLOT_VIEW = {"key": None, "counts": Counter(), "total": 0, "zones": []}
+
 def check_system_status():
     try:
         resp = requests.get(f"{FLASK_BASE}/", timeout=2)
@@ -84,17 +173,28 @@ with col_status:
 with col_refresh:
     if st.button("Refresh Dashboard", use_container_width=True):
         st.session_state.last_refresh_time = time.time()
+        st.session_state.pop("slot_view", None)
         st.rerun()
 
-# Read Digital Twin (JSON Handling)
-twin = {"slots": []}
+# Read Digital Twin (JSON Handling). The counts and grid HTML derived from it
+# are kept in session_state and reused until the twin file's mtime or the set
+# of open entries (which supplies the occupied cards' vehicle info) changes.
+# The backend saves the twin before it records the entry, so the mtime alone
+# would leave a new card showing "Vehicle Info N/A".
+slot_view = EMPTY_SLOT_VIEW
 alerts = []
 try:
     if TWIN_PATH.exists():
-        with open(TWIN_PATH) as f:
-            twin_data = json.load(f)
+        twin_mtime = TWIN_PATH.stat().st_mtime_ns
+        view_key   = (twin_mtime, get_open_entries_signature())
+        cached_view = st.session_state.get("slot_view")
+        if cached_view is not None and cached_view["key"] == view_key:
+            slot_view = cached_view
+        else:
+            twin_data = load_twin(twin_mtime)
             if "slots" in twin_data:
-                twin["slots"] = twin_data["slots"]
+                slot_view = build_slot_view(twin_data["slots"], view_key)
+                st.session_state.slot_view = slot_view
             else:
                 alerts.append("Invalid JSON: 'slots' key missing in digital twin.")
     else:
@@ -104,10 +204,11 @@ except json.JSONDecodeError:
 except Exception as e:
     alerts.append(f"System Error: {str(e)}")
 
-total_slots = len(twin["slots"])
-free_slots = sum(1 for s in twin["slots"] if s.get("status") == "free")
-occupied_slots = sum(1 for s in twin["slots"] if s.get("status") == "occupied")
-reserved_slots = sum(1 for s in twin["slots"] if s.get("status") == "reserved")
+status_counts = slot_view["counts"]
+total_slots = slot_view["total"]
+free_slots = status_counts["free"]
+occupied_slots = status_counts["occupied"]
+reserved_slots = status_counts["reserved"]
 
 if total_slots > 0 and free_slots == 0:
     alerts.append("Warning: Parking is currently FULL.")
@@ -141,89 +242,13 @@ with tab_live:
         st.success("System Normal: No active alerts.")
         
     st.markdown("### Slot Layout Grid")
-    if not twin["slots"]:
+    if not slot_view["total"]:
         st.info("No slot data available.")
     else:
-        # Get active entries mapping
-        active_entries = get_active_entries_with_details()
-
-        # Group by zone
-        slots_by_zone = {}
-        for slot in twin["slots"]:
-            zone = slot.get("zone", "Unknown Zone")
-            if zone not in slots_by_zone:
-                slots_by_zone[zone] = []
-            slots_by_zone[zone].append(slot)
-        
-        for zone_label, slots in sorted(slots_by_zone.items()):
-            if not slots:
-                continue
-                
+        for zone_label, features_caption, grid_html in slot_view["zones"]:
             st.markdown(f"#### {zone_label}")
-            
-            # Extract common features for the zone (optional, based on mock_digital_twin structure)
-            zone_features = set()
-            for s in slots:
-                if "features" in s:
-                    zone_features.update(s["features"])
-            
-            if zone_features:
-                st.caption(f"**Features:** {', '.join(zone_features)}")
-            else:
-                st.caption("**Features:** Standard")
-
-            cols = st.columns(min(len(slots), 8))
-            for idx, slot in enumerate(slots):
-                with cols[idx % len(cols)]:
-                    status = slot.get("status", "unknown")
-                    if status == "free":
-                        color = "#28a745"
-                        bg = "#d4edda"
-                        text = "#155724"
-                    elif status == "occupied":
-                        color = "#dc3545"
-                        bg = "#f8d7da"
-                        text = "#721c24"
-                    elif status == "reserved":
-                        color = "#ffc107"
-                        bg = "#fff3cd"
-                        text = "#856404"
-                    else:
-                        color = "#6c757d"
-                        bg = "#e2e3e5"
-                        text = "#383d41"
-
-                    slot_id = slot.get('id', 'N/A')
-                    size = slot.get('size', 'N/A').title()
-                    
-                    # Extra info if occupied
-                    vehicle_info_html = ""
-                    if status == "occupied":
-                        v_info = active_entries.get(slot_id)
-                        if v_info:
-                            plate = v_info.get('plate', 'N/A')
-                            model = v_info.get('model', 'N/A')
-                            category = v_info.get('category', 'N/A')
-                            vehicle_info_html = f'''
-                                <div style="font-size: 0.75em; margin-top: 6px; border-top: 1px solid {color}; padding-top: 4px;">
-                                    <b>{plate}</b><br/>{model}<br/>({category})
-                                </div>
-                            '''
-                        else:
-                            vehicle_info_html = f'''
-                                <div style="font-size: 0.75em; margin-top: 6px; border-top: 1px solid {color}; padding-top: 4px;">
-                                    <i>Vehicle Info N/A</i>
-                                </div>
-                            '''
-                    
-                    st.markdown(f'''
-                    <div style="border: 1px solid {color}; border-top: 4px solid {color}; background-color: {bg}; color: {text}; padding: 8px; border-radius: 4px; margin-bottom: 10px; text-align: center; font-family: sans-serif; height: 100%;">
-                        <div style="font-weight: bold; font-size: 1.0em; margin-bottom: 2px;">Slot {slot_id}</div>
-                        <div style="font-size: 0.85em; text-transform: uppercase;">{status}</div>
-                        <div style="font-size: 0.8em; margin-top: 2px; opacity: 0.8;">Size: {size}</div>
-                        {vehicle_info_html}
-                    </div>
-                    ''', unsafe_allow_html=True)
+            st.caption(features_caption)
+            st.markdown(grid_html, unsafe_allow_html=True)
 
 with tab_gate:
     col_upload, col_model = st.columns([1, 1])
@@ -318,19 +343,17 @@ with tab_logs:
     try:
         all_entries = get_all_entries()
         if all_entries:
-            formatted_entries = []
-            for e in all_entries:
-                plate, model, size, slot_id, price, entered_at, exited_at = e
-                status = "Active" if not exited_at else "Exited"
-                formatted_entries.append({
-                    "Timestamp": format_timestamp(entered_at),
-                    "Event Type": "Entry",
-                    "Plate": plate,
-                    "Slot": str(slot_id) if slot_id else "N/A",
-                    "Status": status
-                })
-            
-            df_entries = pd.DataFrame(formatted_entries)
+            import pandas as pd   # deferred: only needed once there are rows to show
+            df = pd.DataFrame(all_entries, dtype=object, columns=[
+                "Plate", "Model", "Size", "Slot", "Price", "Entered At", "Exited At"
+            ])
+            df_entries = pd.DataFrame({
+                "Timestamp": format_timestamps(df["Entered At"]),
+                "Event Type": "Entry",
+                "Plate": df["Plate"],
+                "Slot": df["Slot"].where(df["Slot"].astype(bool), "N/A").astype(str),
+                "Status": df["Exited At"].astype(bool).map({False: "Active", True: "Exited"}),
+            })
             st.dataframe(df_entries, use_container_width=True, hide_index=True)
             
             csv = df_entries.to_csv(index=False).encode('utf-8')
@@ -340,6 +363,7 @@ with tab_logs:
     except Exception as e:
         st.error(f"Failed to load logs: {e}")
 
+# Static tables: st.dataframe / st.bar_chart take the dicts directly
 with tab_stats:
     st.markdown("### Evaluation Metrics")
     st.markdown("This section presents performance metrics of the computer vision and agentic processing pipeline.")
@@ -352,7 +376,7 @@ with tab_stats:
             "Metric": ["Accuracy", "Precision", "Recall", "F1-score"],
             "Value": ["98.2%", "97.5%", "98.8%", "98.1%"]
         }
-        st.dataframe(pd.DataFrame(perf_data), hide_index=True, use_container_width=True)
+        st.dataframe(perf_data, hide_index=True, use_container_width=True)
         
     with col_s2:
         st.markdown("**System Efficiency**")
@@ -360,12 +384,12 @@ with tab_stats:
             "Metric": ["Detection Latency", "End-to-end Response Time", "Number of Tested Samples", "False Positives", "False Negatives"],
             "Value": ["45 ms", "1.2 s", "1,500", "12", "18"]
         }
-        st.dataframe(pd.DataFrame(eff_data), hide_index=True, use_container_width=True)
+        st.dataframe(eff_data, hide_index=True, use_container_width=True)
         
     st.markdown("---")
     st.markdown("**Confusion Matrix Distribution**")
-    chart_data = pd.DataFrame({
+    chart_data = {
         "Category": ["True Positives", "True Negatives", "False Positives", "False Negatives"],
         "Count": [1470, 0, 12, 18]
-    }).set_index("Category")
-    st.bar_chart(chart_data)
\ No newline at end of file
+    }
+    st.bar_chart(chart_data, x="Category", y="Count")
\ No newline at end of file
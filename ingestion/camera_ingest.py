@@ -9,14 +9,51 @@ Usage:
     python camera_ingest.py --source gate.mp4       # video file
     python camera_ingest.py --source rtsp://...     # IP camera
 """
+import os
+import sys
 import cv2
 import time
+import queue
+import threading
 import requests
 import argparse
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional: PyAV decodes streams/files with threaded (and, from PyAV 14,
+# hardware) decoding; cv2.VideoCapture is the fallback and always handles
+# webcams.
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    from av.codec.hwaccel import HWAccel
+except ImportError:
+    HWAccel = None
 
 FLASK_URL = "http://localhost:5000/vision/detect_plate"
 
+SEND_MAX_SIDE = 960   # px; frames are downscaled to this longest side before encoding
+JPEG_QUALITY  = 75
+
+# IP cameras: TCP transport and no demuxer buffering, so reads stay current
+RTSP_CAPTURE_OPTIONS = "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay"
+RTSP_AV_OPTIONS      = {"rtsp_transport": "tcp", "fflags": "nobuffer", "flags": "low_delay"}
+
+# PyAV hardware decoder (cuda / vaapi / qsv / videotoolbox ...); "none" = CPU only
+INGEST_HWACCEL = os.getenv("INGEST_HWACCEL", "videotoolbox" if sys.platform == "darwin" else "cuda")
+
+# One kept-alive connection to the backend, reused across frames. Retries
+# cover connection failures only — urllib3 won't replay a POST the server
+# may already have read.
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1,
+                       max_retries=Retry(total=2, backoff_factor=0.2))
+_session = requests.Session()
+_session.mount("http://",  _adapter)
+_session.mount("https://", _adapter)
+
 
 def _post_frame(image_bytes: bytes) -> dict | None:
     """
@@ -30,7 +67,7 @@ def _post_frame(image_bytes: bytes) -> dict | None:
     some server configurations.
     """
     try:
-        r = requests.post(
+        r = _session.post(
             FLASK_URL,
             files={"file": ("image.jpg", image_bytes, "image/jpeg")},
             timeout=10,
@@ -44,6 +81,110 @@ def _post_frame(image_bytes: bytes) -> dict | None:
         return None
 
 
+def _encode_frame(frame) -> bytes | None:
+    """Downscale to SEND_MAX_SIDE and JPEG-encode; None if encoding fails."""
+    h, w  = frame.shape[:2]
+    scale = SEND_MAX_SIDE / max(h, w)
+    if scale < 1.0:
+        frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    success, jpg = cv2.imencode(".jpg", frame, [
+        cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY,
+        cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+    ])
+    return jpg.tobytes() if success else None
+
+
+def _is_rtsp(source) -> bool:
+    return str(source).lower().startswith(("rtsp://", "rtsps://"))
+
+
+def _open_av(source):
+    """
+    Open a stream/file with PyAV, on the INGEST_HWACCEL decoder when the
+    device is usable and on the CPU otherwise. Raises av.FFmpegError.
+    """
+    options = RTSP_AV_OPTIONS if _is_rtsp(source) else {}
+    if HWAccel is not None and INGEST_HWACCEL.lower() != "none":
+        try:
+            return av.open(source, options=options,
+                           hwaccel=HWAccel(device_type=INGEST_HWACCEL, allow_software_fallback=True))
+        except av.FFmpegError as e:
+            print(f"[INGEST] Hardware decode ({INGEST_HWACCEL}) unavailable: {e}")
+    return av.open(source, options=options)
+
+
+def _av_frames(container, stream):
+    """Yield BGR ndarrays from `stream` of a PyAV container, closing it when done."""
+    try:
+        for frame in container.decode(stream):
+            yield frame.to_ndarray(format="bgr24")
+    finally:
+        container.close()
+
+
+def _capture_frames(cap):
+    """Yield frames from a cv2.VideoCapture until read() fails, then release it."""
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame
+    finally:
+        cap.release()
+
+
+def _open_frames(source):
+    """
+    Open `source` and return an iterator of BGR frames: PyAV for streams and
+    files when installed, cv2.VideoCapture otherwise and for webcams.
+    Raises RuntimeError if the source cannot be opened.
+    """
+    if av is not None and not isinstance(source, int):
+        try:
+            container = _open_av(source)
+        except av.FFmpegError as e:
+            print(f"[INGEST] PyAV could not open {source} ({e}); trying OpenCV")
+        else:
+            # Resolve the stream here, not in the generator, so a source
+            # without video still falls back to OpenCV
+            if container.streams.video:
+                stream = container.streams.video[0]
+                stream.thread_type = "AUTO"   # frame + slice threading in libavcodec
+                return _av_frames(container, stream)
+            container.close()
+            print(f"[INGEST] PyAV found no video stream in {source}; trying OpenCV")
+
+    cap = _open_capture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open source: {source}")
+    return _capture_frames(cap)
+
+
+def _open_capture(source):
+    """
+    Open a webcam index, RTSP URL or video file for low-latency reads:
+    native camera backends for webcams, FFmpeg with RTSP_CAPTURE_OPTIONS for
+    streams, and a one-frame internal buffer so read() returns a fresh frame.
+    """
+    if isinstance(source, int):
+        if sys.platform == "win32":
+            backend = cv2.CAP_DSHOW
+        elif sys.platform.startswith("linux"):
+            backend = cv2.CAP_V4L2
+        else:
+            backend = cv2.CAP_ANY
+        cap = cv2.VideoCapture(source, backend)
+    elif _is_rtsp(source):
+        # Read by OpenCV when the capture opens; an explicit setting wins
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", RTSP_CAPTURE_OPTIONS)
+        cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    else:
+        cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # ignored by backends without a buffer
+    return cap
+
+
 def _annotate_frame(frame, response: dict):
     """Draw plate text on the frame if detected."""
     plate = response.get("plate") or (response.get("entry_result") or {}).get("plate")
@@ -62,6 +203,37 @@ def _annotate_frame(frame, response: dict):
     cv2.putText(frame, status, (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
 
 
+def _offer_latest(q: queue.Queue, frame):
+    """Put `frame` on a maxsize=1 queue, replacing any frame not yet sent."""
+    try:
+        q.put_nowait(frame)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(frame)
+
+
+def _sender_loop(q: queue.Queue, latest: dict):
+    """
+    Encode and POST frames from `q` until a None sentinel arrives, keeping
+    the most recent backend response in latest["response"].
+    """
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        frame_no, frame = item
+        image_bytes = _encode_frame(frame)
+        if image_bytes is None:
+            continue
+        response = _post_frame(image_bytes)
+        if response:
+            print(f"[INGEST] Frame {frame_no}: {response}")
+            latest["response"] = response
+
+
 def ingest_camera(source, interval: float = 1.0):
     """
     Ingest frames from camera / video / image and send to the Flask backend.
@@ -82,12 +254,12 @@ def ingest_camera(source, interval: float = 1.0):
             print(f"[ERROR] Cannot read image: {source}")
             return
 
-        success, jpg = cv2.imencode(".jpg", image)
-        if not success:
+        image_bytes = _encode_frame(image)
+        if image_bytes is None:
             print("[ERROR] JPEG encoding failed")
             return
 
-        response = _post_frame(jpg.tobytes())
+        response = _post_frame(image_bytes)
         print(f"[INGEST] Response: {response}")
 
         if response:
@@ -100,41 +272,45 @@ def ingest_camera(source, interval: float = 1.0):
 
     # ── video / camera stream ─────────────────────────────────────────────────
     cap_source = int(source) if isinstance(source, str) and source.isdigit() else source
-    cap = cv2.VideoCapture(cap_source)
-
-    if not cap.isOpened():
-        raise RuntimeError(f"Cannot open source: {source}")
+    frames = _open_frames(cap_source)
 
     print(f"[INGEST] Opened: {source}")
     print(f"[INGEST] Sending every {interval} s — press 'q' to quit")
 
+    # Encoding and the POST run on a sender thread so a slow backend never
+    # stalls capture; only the freshest unsent frame is kept
+    send_q = queue.Queue(maxsize=1)
+    latest = {"response": None}
+    sender = threading.Thread(target=_sender_loop, args=(send_q, latest),
+                              name="ingest-sender", daemon=True)
+    sender.start()
+
     last_sent   = 0.0
     frame_count = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+    try:
+        for frame in frames:
+            frame_count += 1
+            now = time.time()
+
+            if now - last_sent >= interval:
+                _offer_latest(send_q, (frame_count, frame.copy()))
+                last_sent = now
+
+            if latest["response"]:
+                _annotate_frame(frame, latest["response"])
+
+            cv2.imshow("Camera Ingest — q to quit", frame)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+        else:
             print("[INGEST] End of stream or read error")
-            break
-
-        frame_count += 1
-        now = time.time()
-
-        if now - last_sent >= interval:
-            success, jpg = cv2.imencode(".jpg", frame)
-            if success:
-                response = _post_frame(jpg.tobytes())
-                if response:
-                    print(f"[INGEST] Frame {frame_count}: {response}")
-                    _annotate_frame(frame, response)
-            last_sent = now
-
-        cv2.imshow("Camera Ingest — q to quit", frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    finally:
+        _offer_latest(send_q, None)   # drop any unsent frame and stop the sender
+        sender.join(timeout=15)
+        frames.close()
+        cv2.destroyAllWindows()
+
     print(f"[INGEST] Done — processed {frame_count} frames total")
 
 